@@ -209,14 +209,7 @@ class StockDataAggregator:
     
     async def _get_screener_metrics(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Get 84-column screener metrics."""
-        query = "SELECT * FROM screener_metrics WHERE symbol = ?"
-        
-        async with self.db.connection() as db:
-            cursor = await db.execute(query, (symbol,))
-            row = await cursor.fetchone()
-            if row:
-                return dict(row)
-        return None
+        return await self.db.get_symbol_screener_metrics(symbol)
     
     def format_for_prompt(self, data: Dict[str, Any]) -> str:
         """Format aggregated data as text for AI prompt."""
@@ -133,8 +133,11 @@ def backfill_rs_rating():
         
         # Update screener_metrics
         cursor.execute("""
-            INSERT OR REPLACE INTO screener_metrics (symbol, tc_rs, rel_strength_1y)
+            INSERT INTO screener_metrics (symbol, tc_rs, rel_strength_1y)
             VALUES (?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                tc_rs = excluded.tc_rs,
+                rel_strength_1y = excluded.rel_strength_1y
         """, (item['symbol'], rs_rating, round(item['ret'], 2)))
         
         updated += 1
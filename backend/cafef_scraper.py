@@ -179,6 +179,7 @@ class CafeFScraper:
         # First column is typically the metric name
         metric_col = columns[0] if columns else 'Chỉ tiêu'
         period_cols = columns[1:] if len(columns) > 1 else []
+        now = datetime.now().isoformat()
         
         for _, row in df.iterrows():
             metric_name = str(row.iloc[0]) if len(row) > 0 else ''
@@ -203,7 +204,7 @@ class CafeFScraper:
                     'period': str(period_col),
                     'metric_name': metric_name,
                     'value': value,
-                    'updated_at': datetime.now().isoformat()
+                    'updated_at': now
                 })
         
         return records
@@ -128,7 +128,7 @@ class MetricsCalculator:
             # Prepare upsert into stock_metrics
             try:
                 cursor.execute("""
-                    INSERT OR REPLACE INTO stock_metrics (
+                    INSERT INTO stock_metrics (
                         symbol, 
                         rsi_14, macd, macd_signal, macd_histogram, adx,
                         ema_20, ema_50, ema_200,
@@ -144,6 +144,26 @@ class MetricsCalculator:
                         ?, ?, ?,
                         ?, CURRENT_TIMESTAMP
                     )
+                    ON CONFLICT(symbol) DO UPDATE SET
+                        rsi_14 = excluded.rsi_14,
+                        macd = excluded.macd,
+                        macd_signal = excluded.macd_signal,
+                        macd_histogram = excluded.macd_histogram,
+                        adx = excluded.adx,
+                        ema_20 = excluded.ema_20,
+                        ema_50 = excluded.ema_50,
+                        ema_200 = excluded.ema_200,
+                        price_vs_ema20 = excluded.price_vs_ema20,
+                        ema20_vs_ema50 = excluded.ema20_vs_ema50,
+                        ema50_vs_ema200 = excluded.ema50_vs_ema200,
+                        price_return_1m = excluded.price_return_1m,
+                        price_return_3m = excluded.price_return_3m,
+                        price_fluctuation = excluded.price_fluctuation,
+                        adtv_shares = excluded.adtv_shares,
+                        adtv_value = excluded.adtv_value,
+                        volume_vs_adtv = excluded.volume_vs_adtv,
+                        stock_trend = excluded.stock_trend,
+                        updated_at = excluded.updated_at
                 """, (
                     symbol,
                     indicators.get('rsi_14'),
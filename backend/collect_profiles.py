@@ -64,12 +64,31 @@ async def collect_profiles_vci():
                 row = overview.iloc[0] if len(overview) > 0 else {}
                 
                 cursor.execute("""
-                    INSERT OR REPLACE INTO stock_profiles (
+                    INSERT INTO stock_profiles (
                         symbol, short_name, company_name, exchange, industry, sector,
                         company_type, established_date, charter_capital, listing_date,
                         issue_shares, listed_shares, website, phone, email, address,
                         description, history, updated_at
                     ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET
+                        short_name = excluded.short_name,
+                        company_name = excluded.company_name,
+                        exchange = excluded.exchange,
+                        industry = excluded.industry,
+                        sector = excluded.sector,
+                        company_type = excluded.company_type,
+                        established_date = excluded.established_date,
+                        charter_capital = excluded.charter_capital,
+                        listing_date = excluded.listing_date,
+                        issue_shares = excluded.issue_shares,
+                        listed_shares = excluded.listed_shares,
+                        website = excluded.website,
+                        phone = excluded.phone,
+                        email = excluded.email,
+                        address = excluded.address,
+                        description = excluded.description,
+                        history = excluded.history,
+                        updated_at = excluded.updated_at
                 """, (
                     symbol,
                     str(row.get('short_name', row.get('organ_short_name', '')))[:50],
@@ -16,6 +16,12 @@ class Settings(BaseSettings):
         "DATABASE_PATH", 
         str(Path(__file__).parent / "data" / "vnstock_data.db")
     )
+    # Read-only connections pooled for heavy screener/price-board reads
+    DATABASE_READ_CONNECTIONS: int = int(os.getenv("DATABASE_READ_CONNECTIONS", "4"))
+    # Seconds to cache lookup queries (sectors, symbols, counts)
+    DB_LOOKUP_CACHE_TTL: float = float(os.getenv("DB_LOOKUP_CACHE_TTL", "60"))
+    # Seconds to cache screener result counts between page requests
+    DB_COUNT_CACHE_TTL: float = float(os.getenv("DB_COUNT_CACHE_TTL", "30"))
     
     # ===========================================
     # VnStock Rate Limiting (CRITICAL for 24/7)
@@ -14,7 +14,7 @@ Data sources:
 import asyncio
 import aiohttp
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -211,7 +211,8 @@ class Cophieu68Collector:
         vt=2: P/B, EPS, PE, PS, ROA, ROE
         vt=3: Nợ, Vốn CSH, Tổng TS, Tiền mặt
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        # Only tables are ever read, so the rest of the page isn't built
+        soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table'))
         results = []
         
         # Find the main data table
@@ -421,8 +422,9 @@ class Cophieu68Collector:
             await asyncio.sleep(5)
         
         # Add timestamp
-        for symbol in merged_data:
-            merged_data[symbol]['updated_at'] = datetime.now().isoformat()
+        now = datetime.now().isoformat()
+        for stock in merged_data.values():
+            stock['updated_at'] = now
         
         logger.info(f"\n🎉 Collection complete: {len(merged_data)} total stocks across all exchanges")
         return merged_data
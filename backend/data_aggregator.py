@@ -289,8 +289,10 @@ class DataAggregator:
                     'data_source': 'cophieu68',
                 })
             
-            await self.db.upsert_stocks(stock_records)
-            await self.db.upsert_stock_prices(price_records)
+            # Listings and their prices land together
+            async with self.db.transaction():
+                await self.db.upsert_stocks(stock_records)
+                await self.db.upsert_stock_prices(price_records)
             saved_count += len(stock_records)
         
         # Save industry flow
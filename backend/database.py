@@ -4,17 +4,848 @@ Database manager for VnStock Screener.
 Provides async SQLite operations with connection pooling and error handling.
 """
 
+import asyncio
+import inspect
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 import aiosqlite
+import orjson
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, AsyncIterator, Tuple, Callable
 from contextlib import asynccontextmanager
 from loguru import logger
 
 from config import settings
 
 
+# Columns copied straight from the input dicts by upsert_stock_prices
+# (bvps, data_source and updated_at need defaults and are appended after).
+_STOCK_PRICE_COLUMNS = (
+    'symbol', 'current_price', 'price_change', 'percent_change',
+    'open_price', 'high_price', 'low_price', 'close_price',
+    'volume', 'market_cap', 'pe_ratio', 'pb_ratio',
+    'eps', 'roe', 'roa', 'revenue', 'profit',
+    # Cophieu68 specific fields
+    'book_value', 'ps_ratio', 'total_debt', 'owner_equity',
+    'total_assets', 'debt_to_equity', 'equity_to_assets',
+    'cash', 'foreign_ownership', 'avg_volume_52w', 'listed_shares',
+)
+
+# Columns copied straight from the TCBS screener dicts by
+# upsert_screener_metrics (updated_at is appended per batch).
+_SCREENER_COLUMNS = (
+    'symbol', 'exchange', 'industry', 'market_cap', 'pe_ratio',
+    'pb_ratio', 'ev_ebitda', 'eps', 'roe', 'dividend_yield',
+    'gross_margin', 'net_margin', 'doe', 'revenue_growth_1y',
+    'revenue_growth_5y', 'eps_growth_1y', 'eps_growth_5y',
+    'last_quarter_revenue_growth', 'last_quarter_profit_growth',
+    'rsi14', 'macd_histogram', 'price_vs_sma5', 'price_vs_sma10',
+    'price_vs_sma20', 'price_vs_sma50', 'price_vs_sma100',
+    'bolling_band_signal', 'dmi_signal', 'rsi14_status', 'vol_vs_sma5',
+    'vol_vs_sma10', 'vol_vs_sma20', 'vol_vs_sma50',
+    'avg_trading_value_5d', 'avg_trading_value_10d',
+    'avg_trading_value_20d', 'price_near_realtime', 'price_growth_1w',
+    'price_growth_1m', 'prev_1d_growth_pct', 'prev_1m_growth_pct',
+    'prev_1y_growth_pct', 'prev_5y_growth_pct',
+    'pct_away_from_hist_peak', 'pct_off_hist_bottom',
+    'pct_1y_from_peak', 'pct_1y_from_bottom', 'relative_strength_3d',
+    'rel_strength_1m', 'rel_strength_3m', 'rel_strength_1y', 'tc_rs',
+    'alpha', 'beta', 'stock_rating', 'business_operation',
+    'business_model', 'financial_health', 'tcbs_recommend',
+    'tcbs_buy_sell_signal', 'foreign_vol_pct', 'foreign_transaction',
+    'foreign_buysell_20s', 'uptrend', 'breakout',
+    'price_break_out52_week', 'heating_up',
+    'num_increase_continuous_day', 'num_decrease_continuous_day',
+    'profit_last_4q', 'free_transfer_rate', 'net_cash_per_market_cap',
+    'net_cash_per_total_assets', 'has_financial_report',
+)
+
+_SHAREHOLDER_COLUMNS = (
+    'symbol', 'shareholder_id', 'shareholder_name', 'quantity',
+    'ownership_percent', 'update_date',
+)
+# Everything SELECT * returned, for readers that ask for no particular columns
+_SHAREHOLDER_READ_COLUMNS = ('id', *_SHAREHOLDER_COLUMNS, 'created_at')
+
+_OFFICER_COLUMNS = (
+    'symbol', 'officer_id', 'officer_name', 'position', 'position_short',
+    'ownership_percent', 'quantity', 'status', 'update_date',
+)
+_OFFICER_READ_COLUMNS = ('id', *_OFFICER_COLUMNS, 'created_at')
+
+_PRICE_BOARD_COLUMNS = (
+    'symbol', 'exchange', 'ceiling', 'floor', 'ref_price',
+    'prior_close', 'match_price', 'match_volume', 'accumulated_volume',
+    'accumulated_value', 'avg_match_price', 'highest', 'lowest',
+    'foreign_buy_volume', 'foreign_sell_volume', 'current_room',
+    'total_room', 'bid_1_price', 'bid_1_volume', 'bid_2_price',
+    'bid_2_volume', 'bid_3_price', 'bid_3_volume', 'ask_1_price',
+    'ask_1_volume', 'ask_2_price', 'ask_2_volume', 'ask_3_price',
+    'ask_3_volume', 'updated_at',
+)
+
+
+# (source key in the vnstock statements, financial_metrics column)
+_FINANCIAL_FIELDS = (
+    ('revenue', 'revenue'),
+    ('gross_profit', 'gross_profit'),
+    ('operating_profit', 'operating_profit'),
+    ('net_profit', 'net_profit'),
+    ('total_assets', 'total_assets'),
+    ('total_liabilities', 'total_liabilities'),
+    ('total_equity', 'total_equity'),
+    ('current_assets', 'current_assets'),
+    ('current_liabilities', 'current_liabilities'),
+    ('cash_and_equivalents', 'cash_and_equivalents'),
+    ('priceToEarning', 'pe_ratio'),
+    ('priceToBook', 'pb_ratio'),
+    ('roe', 'roe'),
+    ('roa', 'roa'),
+    ('grossMargin', 'gross_margin'),
+    ('netMargin', 'net_margin'),
+    ('debtToEquity', 'debt_to_equity'),
+    ('eps', 'earnings_per_share'),
+    ('bookValuePerShare', 'book_value_per_share'),
+)
+_FINANCIAL_SOURCES = frozenset(source for source, _ in _FINANCIAL_FIELDS)
+_FINANCIAL_COLUMNS = ('symbol', 'period', *(column for _, column in _FINANCIAL_FIELDS), 'updated_at')
+
+_INDUSTRY_FLOW_COLUMNS = (
+    'industry_name', 'industry_name_en', 'cashflow', 'rate_of_change',
+    'rs_short', 'rs_mid', 'rs_relative', 'net_buy_volume', 'net_buy_value',
+    'sector_performance', 'source', 'date_collected', 'timestamp',
+)
+_INDUSTRY_FLOW_READ_COLUMNS = ('id', *_INDUSTRY_FLOW_COLUMNS)
+# The scraped figures: a re-submitted row only rewrites when one differs
+_INDUSTRY_FLOW_DATA_COLUMNS = tuple(
+    c for c in _INDUSTRY_FLOW_COLUMNS if c not in ('industry_name', 'date_collected', 'timestamp')
+)
+
+# Applied once to every pooled connection when it is opened.
+# busy_timeout lets a connection wait out another process's lock (e.g. a
+# maintenance script) instead of failing with SQLITE_BUSY at once.
+# In WAL mode synchronous=NORMAL only syncs at checkpoints, so the many
+# small commits (update logs, per-batch upserts) skip the fsync.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=1073741824",
+    "PRAGMA analysis_limit=1000",
+)
+
+# Compiled statements kept per connection (sqlite3 defaults to 128). The
+# screener and multi-row upsert builders emit a few hundred distinct but
+# repeating SQL texts, so a larger cache keeps them from being re-prepared.
+_CACHED_STATEMENTS = 512
+
+# Readers are opened with mode=ro; query_only also rejects temp-table and
+# other writes that mode=ro still allows, so a borrowed reader never
+# carries state back into the pool.
+_READER_PRAGMAS = (
+    "PRAGMA query_only=1",
+)
+
+# Only the writer dirties pages. Keeping them in the cache until commit
+# (cache_spill=OFF) and checkpointing less often keeps large upserts
+# from stalling on mid-transaction spills and frequent checkpoints.
+_WRITER_PRAGMAS = (
+    "PRAGMA cache_spill=OFF",
+    "PRAGMA wal_autocheckpoint=10000",
+)
+
+# One-off fill of stocks.effective_market_cap / effective_price for
+# databases created before the columns (triggers keep them current after)
+_BACKFILL_EFFECTIVE_COLUMNS = """
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective e WHERE e.symbol = stocks.symbol)
+"""
+
+# Price-history batches at least this large truncate the WAL afterwards
+# so a backfill doesn't leave a WAL file the size of the batch behind.
+_WAL_TRUNCATE_ROWS = 50_000
+
+# Batches at least this large are written by the sqlite3 batch writer in
+# one executor call instead of one aiosqlite round trip per statement.
+_BULK_LOAD_ROWS = 5_000
+
+
+# Host parameters allowed in one statement (raised from 999 in SQLite 3.32)
+_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+@lru_cache(maxsize=64)
+def _upsert_query(
+    table: str,
+    columns: Sequence[str],
+    conflict: Sequence[str],
+    rows: int = 1,
+    changed: Sequence[str] = (),
+) -> str:
+    """
+    Build an ``INSERT ... ON CONFLICT DO UPDATE`` statement.
+    
+    Unlike ``INSERT OR REPLACE`` (delete + insert), the existing row is
+    updated in place, so its rowid, columns not listed here and untouched
+    index entries are preserved. ``rows`` > 1 builds a multi-row VALUES
+    list. With ``changed``, a conflicting row is only rewritten when one of
+    those columns differs, so re-submitted identical rows cost no page
+    writes. All sequences must be tuples so the result can be cached.
+    """
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in conflict)
+    values = "(" + ", ".join("?" * len(columns)) + ")"
+    query = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES {', '.join([values] * rows)} "
+        f"ON CONFLICT({', '.join(conflict)}) DO UPDATE SET {updates}"
+    )
+    if changed:
+        query += " WHERE " + " OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in changed)
+    return query
+
+
+async def _upsert_multi_row(
+    db: aiosqlite.Connection,
+    table: str,
+    columns: Tuple[str, ...],
+    conflict: Tuple[str, ...],
+    params: Sequence[Sequence[Any]],
+):
+    """
+    Upsert ``params`` packing as many rows per statement as the variable
+    limit allows, instead of stepping one statement per row.
+    
+    Duplicate keys inside a statement are fine: SQLite inserts the rows in
+    order, so a later duplicate updates the earlier one.
+    """
+    rows_per_stmt = max(1, _MAX_VARIABLES // len(columns))
+    for start in range(0, len(params), rows_per_stmt):
+        chunk = params[start:start + rows_per_stmt]
+        query = _upsert_query(table, columns, conflict, rows=len(chunk))
+        await db.execute(query, list(chain.from_iterable(chunk)))
+
+
+async def _upsert_multi_row_pipelined(
+    db: aiosqlite.Connection,
+    table: str,
+    columns: Tuple[str, ...],
+    conflict: Tuple[str, ...],
+    items: Sequence[Any],
+    make_row: Callable[[Any], Sequence[Any]],
+):
+    """
+    Like _upsert_multi_row, but builds each statement's parameters from
+    ``items`` with ``make_row`` in a worker thread while the previous
+    statement runs, keeping wide row building off the event loop.
+    """
+    rows_per_stmt = max(1, _MAX_VARIABLES // len(columns))
+    chunks = [items[start:start + rows_per_stmt] for start in range(0, len(items), rows_per_stmt)]
+    
+    def build(chunk: Sequence[Any]) -> List[Any]:
+        return list(chain.from_iterable(map(make_row, chunk)))
+    
+    pending = asyncio.ensure_future(asyncio.to_thread(build, chunks[0]))
+    try:
+        for i, chunk in enumerate(chunks):
+            params = await pending
+            if i + 1 < len(chunks):
+                pending = asyncio.ensure_future(asyncio.to_thread(build, chunks[i + 1]))
+            query = _upsert_query(table, columns, conflict, rows=len(chunk))
+            await db.execute(query, params)
+    finally:
+        pending.cancel()
+
+
+def _sync_write_batch(conn: sqlite3.Connection, sql: str, params: Any) -> int:
+    """Run one executemany in its own BEGIN IMMEDIATE transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rowcount = conn.executemany(sql, params).rowcount
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return rowcount
+
+
+def _sync_upsert_multi_row(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: Tuple[str, ...],
+    conflict: Tuple[str, ...],
+    params: Sequence[Sequence[Any]],
+):
+    """_upsert_multi_row on a sqlite3 connection, in its own transaction."""
+    rows_per_stmt = max(1, _MAX_VARIABLES // len(columns))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for start in range(0, len(params), rows_per_stmt):
+            chunk = params[start:start + rows_per_stmt]
+            query = _upsert_query(table, columns, conflict, rows=len(chunk))
+            conn.execute(query, list(chain.from_iterable(chunk)))
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+@asynccontextmanager
+async def _write_transaction(db: aiosqlite.Connection):
+    """
+    Run a block in one ``BEGIN IMMEDIATE`` transaction.
+    
+    The reserved lock is taken up front, so a writer never has to upgrade
+    from a read lock mid-batch; the block commits on success and rolls
+    back on error. Inside an already-open transaction it joins it.
+    """
+    # A joined transaction is committed or rolled back by its owner
+    owner = not db.in_transaction
+    if owner:
+        await db.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        if owner:
+            await db.rollback()
+        raise
+    if owner:
+        await db.commit()
+
+
+def _fts_phrase(text: str) -> str:
+    """Quote text as a single FTS5 phrase so operators in it are literal."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _stock_search_clause(search: str, alias: str = 's') -> Tuple[str, List[Any]]:
+    """
+    Build the WHERE fragment for a symbol/company-name substring search.
+    
+    Uses the stocks_fts trigram index when the term is long enough to
+    form a trigram, otherwise falls back to LIKE.
+    """
+    if len(search) < 3:
+        return (
+            f"({alias}.symbol LIKE ? OR {alias}.company_name LIKE ?)",
+            [f"%{search}%", f"%{search}%"],
+        )
+    return (
+        f"{alias}.rowid IN (SELECT rowid FROM stocks_fts WHERE stocks_fts MATCH ?)",
+        [_fts_phrase(search)],
+    )
+
+
+def _column_list(columns: Optional[Sequence[str]], allowed: Sequence[str]) -> str:
+    """
+    Render a SELECT column list, defaulting to ``allowed``.
+    
+    Requested columns are checked against ``allowed`` before they are
+    spliced into SQL.
+    """
+    if columns is None:
+        return ", ".join(allowed)
+    unknown = set(columns).difference(allowed)
+    if unknown or not columns:
+        raise ValueError(f"Unknown or empty column selection: {sorted(unknown)}")
+    return ", ".join(columns)
+
+
+def _rows_to_dicts(cursor, rows) -> List[Dict[str, Any]]:
+    """Convert fetched rows to dicts, reading column names once per cursor."""
+    keys = tuple(column[0] for column in cursor.description)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+# Placeholders the statement APIs use for a missing figure
+_MISSING_NUMBERS = frozenset(('', '-', 'nan', 'NaN', 'None', 'null', 'N/A', 'n/a'))
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """
+    Convert a loosely typed API value to float; blanks and junk become None.
+    
+    The result is always a plain float or None (never a numpy scalar,
+    Decimal or str), so sqlite3 binds it directly as REAL or NULL.
+    """
+    kind = type(value)
+    if kind is float:
+        return value
+    if kind is int:
+        return float(value)
+    if value is None or (kind is str and value in _MISSING_NUMBERS):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _json_text(value: Any) -> Optional[str]:
+    """Serialize a JSON column value to text; empty values are stored as NULL."""
+    if not value:
+        return None
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+async def _iter_dicts(cursor, chunk_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+    """Yield rows as dicts, pulling them from SQLite ``chunk_size`` at a time."""
+    keys = tuple(column[0] for column in cursor.description)
+    while True:
+        rows = await cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(keys, row))
+
+
+# =========================================
+# Screener Query Building
+# =========================================
+
+# Screener filter arguments and the predicate each one adds. Queries are
+# assembled from the set of active filters only, so the SQL text is
+# stable per combination and SQLite's statement cache can reuse the plan.
+_SCREENER_FILTERS: Dict[str, str] = {
+    # Basic filters
+    'exchange': "s.exchange = ?",
+    'sector': "s.sector = ?",
+    'industry': "sm.industry LIKE ?",
+    # Search goes through the stocks_fts trigram index; terms too short to
+    # form a trigram use the LIKE variant (see _screener_signature)
+    'search': "s.rowid IN (SELECT rowid FROM stocks_fts WHERE stocks_fts MATCH ?)",
+    'search_short': "(s.symbol LIKE ? OR s.company_name LIKE ?)",
+    # General metrics
+    'market_cap_min': "s.effective_market_cap >= ?",
+    'market_cap_max': "s.effective_market_cap <= ?",
+    'price_min': "s.effective_price >= ?",
+    'price_max': "s.effective_price <= ?",
+    'price_change_min': "sm.prev_1d_growth_pct >= ?",
+    'price_change_max': "sm.prev_1d_growth_pct <= ?",
+    'adtv_value_min': "sm.avg_trading_value_20d >= ?",
+    'volume_vs_adtv_min': "sm.vol_vs_sma20 >= ?",
+    # Technical signals (adx_min is accepted but ADX only lives in stock_metrics)
+    'stock_rating_min': "sm.stock_rating >= ?",
+    'rs_min': "sm.rel_strength_3m >= ?",
+    'rs_max': "sm.rel_strength_3m <= ?",
+    'rsi_min': "sm.rsi14 >= ?",
+    'rsi_max': "sm.rsi14 <= ?",
+    'price_vs_sma20_min': "sm.price_vs_sma20 >= ?",
+    'price_vs_sma20_max': "sm.price_vs_sma20 <= ?",
+    'macd_histogram_min': "sm.macd_histogram >= ?",
+    'price_return_1m_min': "sm.prev_1m_growth_pct >= ?",
+    'price_return_1m_max': "sm.prev_1m_growth_pct <= ?",
+    'price_return_3m_min': "sm.rel_strength_3m >= ?",
+    # Financial indicators
+    'pe_min': "COALESCE(sm.pe_ratio, sp.pe_ratio) >= ?",
+    'pe_max': "COALESCE(sm.pe_ratio, sp.pe_ratio) <= ?",
+    'pb_min': "COALESCE(sm.pb_ratio, sp.pb_ratio) >= ?",
+    'pb_max': "COALESCE(sm.pb_ratio, sp.pb_ratio) <= ?",
+    'roe_min': "COALESCE(sm.roe, sp.roe) >= ?",
+    'roe_max': "COALESCE(sm.roe, sp.roe) <= ?",
+    'revenue_growth_min': "sm.revenue_growth_1y >= ?",
+    'npat_growth_min': "sm.last_quarter_profit_growth >= ?",
+    'net_margin_min': "sm.net_margin >= ?",
+    'gross_margin_min': "sm.gross_margin >= ?",
+    'dividend_yield_min': "sm.dividend_yield >= ?",
+}
+
+# Filters that only touch screener_metrics and can be applied before
+# the joins (COALESCE-with-stock_prices filters have to stay outside)
+_SCREENER_PUSHDOWN = frozenset(
+    name for name, predicate in _SCREENER_FILTERS.items()
+    if predicate.startswith('sm.')
+)
+
+# Filters matched as substrings; their values are wrapped in %...%
+_SCREENER_LIKE_FILTERS = frozenset({'industry', 'search_short'})
+
+# Signature names bound from a differently named argument
+_SCREENER_FILTER_ARGS = {'search_short': 'search'}
+
+_SCREENER_TREND_FILTERS = {
+    'uptrend': "sm.uptrend = 1",
+    'breakout': "sm.breakout = 1",
+    'heating_up': "sm.heating_up = 1",
+}
+
+_SCREENER_SORT_COLUMNS = {
+    'market_cap': 's.effective_market_cap',
+    'current_price': 's.effective_price',
+    'percent_change': 'COALESCE(sm.prev_1d_growth_pct, sp.percent_change)',
+    'volume': 'sp.volume',
+    'pe': 'COALESCE(sm.pe_ratio, sp.pe_ratio)',
+    'pb': 'COALESCE(sm.pb_ratio, sp.pb_ratio)',
+    'roe': 'COALESCE(sm.roe, sp.roe)',
+    'rsi': 'COALESCE(stm.rsi_14, sm.rsi14)',
+    'relativeStrength': 'sm.tc_rs', # RS Rating
+    'rsRating': 'sm.tc_rs',
+    'stockRating': 'sm.stock_rating',
+    'revenueGrowth': 'sm.revenue_growth_1y',
+    'netMargin': 'sm.net_margin'
+}
+
+# Result columns of get_stocks_with_screener_data
+_SCREENER_DATA_COLUMNS = """
+        s.symbol,
+        s.company_name,
+        s.exchange,
+        s.sector,
+        s.industry,
+        -- Price data (prefer screener_metrics for fresh data)
+        s.effective_price as current_price,
+        sp.price_change,
+        COALESCE(sm.prev_1d_growth_pct, sp.percent_change) as percent_change,
+        sp.volume,
+        -- General metrics
+        s.effective_market_cap as market_cap,
+        sm.avg_trading_value_20d as adtv_value,
+        sm.vol_vs_sma20 as volume_vs_adtv,
+        -- Technical signals
+        sm.stock_rating,
+        COALESCE(stm.rel_strength_1m, sm.rel_strength_3m) as relative_strength,
+        sm.tc_rs,
+        COALESCE(stm.rsi_14, sm.rsi14) as rsi,
+        sm.rsi14_status,
+        sm.price_vs_sma5,
+        sm.price_vs_sma10,
+        COALESCE(stm.price_vs_ema20, sm.price_vs_sma20) as price_vs_sma20,
+        sm.price_vs_sma50,
+        sm.price_vs_sma100,
+        COALESCE(stm.macd_histogram, sm.macd_histogram) as macd_histogram,
+        stm.macd,
+        stm.macd_signal,
+        stm.adx,
+        stm.stock_trend,
+        
+        -- Signals (Mapped)
+        CASE WHEN stm.stock_trend IN ('uptrend', 'strong_uptrend') THEN 1 ELSE 0 END as uptrend,
+        CASE WHEN stm.stock_trend = 'breakout' THEN 1 ELSE 0 END as breakout,
+        
+        sm.bolling_band_signal,
+        sm.dmi_signal,
+        sm.price_break_out52_week,
+        sm.heating_up,
+        -- Price performance
+        sm.price_growth_1w,
+        sm.price_growth_1m,
+        sm.prev_1m_growth_pct as price_return_1m,
+        sm.rel_strength_1m as price_return_outperform_1m,
+        sm.prev_1y_growth_pct as price_return_1y,
+        sm.pct_away_from_hist_peak,
+        sm.pct_off_hist_bottom,
+        -- Financial indicators
+        COALESCE(sm.pe_ratio, sp.pe_ratio) as pe_ratio,
+        COALESCE(sm.pb_ratio, sp.pb_ratio) as pb_ratio,
+        COALESCE(sm.roe, sp.roe) as roe,
+        sm.eps,
+        sp.revenue,
+        sp.profit,
+        sp.total_assets,
+        sp.total_debt,
+        sp.owner_equity,
+        sp.cash,
+        sp.debt_to_equity,
+        sp.foreign_ownership,
+        sm.dividend_yield,
+        COALESCE(sm.gross_margin, CASE WHEN sp.revenue > 0 THEN ((sp.revenue - sp.profit) / sp.revenue * 100) ELSE NULL END) as gross_margin, -- Rough estimate if missing
+        COALESCE(sm.net_margin, CASE WHEN sp.revenue > 0 THEN (sp.profit / sp.revenue * 100) ELSE NULL END) as net_margin,
+        sm.doe as debt_equity,
+        -- Growth metrics
+        sm.revenue_growth_1y,
+        sm.eps_growth_1y,
+        sm.last_quarter_revenue_growth,
+        sm.last_quarter_profit_growth as npat_growth,
+        -- TCBS ratings
+        sm.financial_health,
+        sm.business_model,
+        sm.business_operation,
+        sm.tcbs_recommend,
+        -- Foreign activity
+        sm.foreign_vol_pct,
+        sm.foreign_buysell_20s,
+        -- Metadata
+        sm.updated_at as screener_updated_at,
+        -- Matches before LIMIT/OFFSET
+        COUNT(*) OVER() AS total_count
+"""
+
+
+def _screener_signature(filters: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Names of the screener filters that are set (None and '' are unset).
+    
+    Filters pushed down into the screener CTE come first, matching the
+    order their placeholders appear in the SQL.
+    """
+    active = [
+        name for name in _SCREENER_FILTERS
+        if filters.get(name) is not None and filters.get(name) != ''
+    ]
+    if 'search' in active and len(filters['search']) < 3:
+        active[active.index('search')] = 'search_short'
+    return tuple(sorted(active, key=lambda name: name not in _SCREENER_PUSHDOWN))
+
+
+def _screener_params(signature: Tuple[str, ...], filters: Dict[str, Any]) -> List[Any]:
+    """Bind the active filter values in signature order."""
+    params = []
+    for name in signature:
+        value = filters[_SCREENER_FILTER_ARGS.get(name, name)]
+        if name in _SCREENER_LIKE_FILTERS:
+            value = f"%{value}%"
+        elif name == 'search':
+            value = _fts_phrase(value)
+        params.extend([value] * _SCREENER_FILTERS[name].count('?'))
+    return params
+
+
+def _screener_from(
+    signature: Tuple[str, ...],
+    stock_trend: Optional[str] = None,
+    technical: bool = False,
+    select_columns: bool = True,
+) -> Tuple[str, str]:
+    """
+    Build the (WITH prefix, FROM ... WHERE ...) parts of a screener query.
+    
+    Predicates on screener_metrics alone are applied inside a CTE that is
+    inner-joined, so the join only probes screener rows that already
+    pass. This is equivalent to filtering after the LEFT JOIN, since those
+    predicates can never hold for a stock without a screener row.
+    
+    Without ``select_columns`` (counts), LEFT JOINs that no predicate
+    reads are left out; each matches at most one row per stock, so they
+    never change the count.
+    """
+    pushed = [_SCREENER_FILTERS[name] for name in signature if name in _SCREENER_PUSHDOWN]
+    if stock_trend in _SCREENER_TREND_FILTERS:
+        pushed.append(_SCREENER_TREND_FILTERS[stock_trend])
+    outer = ['s.is_active = 1']
+    outer.extend(_SCREENER_FILTERS[name] for name in signature if name not in _SCREENER_PUSHDOWN)
+    
+    reads = " ".join(outer)
+    if pushed:
+        prefix = (
+            "WITH sm_f AS (SELECT * FROM screener_metrics sm"
+            f" WHERE {' AND '.join(pushed)}) "
+        )
+        screener_join = " JOIN sm_f sm ON s.symbol = sm.symbol"
+    elif select_columns or "sm." in reads:
+        prefix = ""
+        screener_join = " LEFT JOIN screener_metrics sm ON s.symbol = sm.symbol"
+    else:
+        prefix = ""
+        screener_join = ""
+    
+    body = " FROM stocks s"
+    if select_columns or "sp." in reads:
+        body += " LEFT JOIN stock_prices sp ON s.symbol = sp.symbol"
+    body += screener_join
+    if technical:
+        body += " LEFT JOIN stock_metrics stm ON s.symbol = stm.symbol"
+    body += f" WHERE {' AND '.join(outer)}"
+    return prefix, body
+
+
+@lru_cache(maxsize=256)
+def _screener_data_query(
+    signature: Tuple[str, ...], stock_trend: Optional[str], sort_col: str, sort_dir: str
+) -> str:
+    """SQL for get_stocks_with_screener_data; LIMIT/OFFSET are bound."""
+    prefix, body = _screener_from(signature, stock_trend, technical=True)
+    return (
+        f"{prefix}SELECT {_SCREENER_DATA_COLUMNS}{body}"
+        f" ORDER BY {sort_col} {sort_dir} NULLS LAST LIMIT ? OFFSET ?"
+    )
+
+
+@lru_cache(maxsize=256)
+def _screener_count_query(signature: Tuple[str, ...], stock_trend: Optional[str]) -> str:
+    """SQL for count_stocks_with_screener_data."""
+    prefix, body = _screener_from(signature, stock_trend, select_columns=False)
+    return f"{prefix}SELECT COUNT(*) as count{body}"
+
+
+def _screener_statement(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Data query and parameters for a screener page."""
+    signature = _screener_signature(filters)
+    sort_col = _SCREENER_SORT_COLUMNS.get(filters.get('sort_by'), _SCREENER_SORT_COLUMNS['market_cap'])
+    sort_dir = 'ASC' if (filters.get('order') or '').lower() == 'asc' else 'DESC'
+    query = _screener_data_query(signature, filters.get('stock_trend'), sort_col, sort_dir)
+    params = _screener_params(signature, filters)
+    return query, params + [filters.get('limit', 100), filters.get('offset', 0)]
+
+
+# =========================================
+# Listing Query Building
+# =========================================
+
+# Filters of iter_stocks and iter_stocks_with_metrics. As with the
+# screener, only the active predicates are rendered and the text is
+# cached per combination, so each variant maps to one prepared statement
+# that still lets SQLite pick an index for the predicates it has.
+_STOCK_LIST_FILTERS: Dict[str, str] = {
+    'exchange': "s.exchange = ?",
+    'sector': "s.sector = ?",
+    'pe_min': "sp.pe_ratio >= ?",
+    'pe_max': "sp.pe_ratio <= ?",
+    'pb_min': "sp.pb_ratio >= ?",
+    'pb_max': "sp.pb_ratio <= ?",
+    'roe_min': "sp.roe >= ?",
+    'market_cap_min': "sp.market_cap >= ?",
+}
+
+_METRIC_LIST_FILTERS: Dict[str, str] = {
+    'rsi_min': "sm.rsi_14 >= ?",
+    'rsi_max': "sm.rsi_14 <= ?",
+    'trend': "sm.stock_trend = ?",
+    'adx_min': "sm.adx >= ?",
+}
+
+# Filters of get_screener_metrics, which reads screener_metrics alone
+_SCREENER_METRIC_FILTERS: Dict[str, str] = {
+    'exchange': "exchange = ?",
+    'industry': "industry LIKE ?",
+    'pe_min': "pe_ratio >= ?",
+    'pe_max': "pe_ratio <= ?",
+    'roe_min': "roe >= ?",
+    'rsi_min': "rsi14 >= ?",
+    'rsi_max': "rsi14 <= ?",
+}
+
+_STOCK_LIST_COLUMNS = """
+        s.symbol,
+        s.company_name,
+        s.exchange,
+        s.sector,
+        s.industry,
+        sp.current_price,
+        sp.price_change,
+        sp.percent_change,
+        sp.volume,
+        sp.market_cap,
+        sp.pe_ratio,
+        sp.pb_ratio,
+        sp.roe,
+        sp.roa,
+        sp.eps,
+        sp.revenue,
+        sp.profit,
+        sp.total_assets,
+        sp.total_debt,
+        sp.owner_equity,
+        sp.cash,
+        sp.debt_to_equity,
+        sp.foreign_ownership,
+        sp.updated_at
+"""
+
+
+# Keyset predicates continuing iter_stocks after a (market_cap, symbol)
+# row, matching its ORDER BY; listings without a market cap sort last
+_STOCK_LIST_AFTER = {
+    'value': "(sp.market_cap < ? OR (sp.market_cap = ? AND s.symbol > ?) OR sp.market_cap IS NULL)",
+    'null': "(sp.market_cap IS NULL AND s.symbol > ?)",
+}
+
+
+def _list_signature(predicates: Dict[str, str], filters: Dict[str, Any]) -> Tuple[str, ...]:
+    """Names of the listing filters that are set (None and '' are unset)."""
+    return tuple(
+        name for name in predicates
+        if filters.get(name) is not None and filters.get(name) != ''
+    )
+
+
+@lru_cache(maxsize=128)
+def _stock_list_query(
+    signature: Tuple[str, ...], search_clause: Optional[str], after: Optional[str] = None
+) -> str:
+    """SQL for iter_stocks; LIMIT/OFFSET are bound."""
+    where = ['s.is_active = 1', *(_STOCK_LIST_FILTERS[name] for name in signature)]
+    if search_clause:
+        where.append(search_clause)
+    if after:
+        where.append(_STOCK_LIST_AFTER[after])
+    return (
+        f"SELECT {_STOCK_LIST_COLUMNS}"
+        " FROM stocks s"
+        " LEFT JOIN stock_prices sp ON s.symbol = sp.symbol"
+        f" WHERE {' AND '.join(where)}"
+        " ORDER BY sp.market_cap DESC NULLS LAST, s.symbol LIMIT ? OFFSET ?"
+    )
+
+
+@lru_cache(maxsize=128)
+def _screener_metrics_queries(signature: Tuple[str, ...], column_list: str) -> Tuple[str, str]:
+    """
+    (ranked, unranked) SQL for get_screener_metrics; LIMIT is bound.
+    
+    Rows with a market cap come first, read in order from the partial
+    index; rows without one are only fetched to fill a short page.
+    """
+    where = ' AND '.join(['1=1', *(_SCREENER_METRIC_FILTERS[name] for name in signature)])
+    query = f"SELECT {column_list} FROM screener_metrics WHERE {where}"
+    return (
+        query + " AND market_cap IS NOT NULL ORDER BY market_cap DESC LIMIT ?",
+        query + " AND market_cap IS NULL LIMIT ?",
+    )
+
+
+@lru_cache(maxsize=64)
+def _metric_list_query(signature: Tuple[str, ...]) -> str:
+    """SQL for iter_stocks_with_metrics; LIMIT is bound."""
+    where = ['s.is_active = 1', *(_METRIC_LIST_FILTERS[name] for name in signature)]
+    return (
+        "SELECT s.symbol, s.company_name, s.exchange, s.sector,"
+        " sp.current_price, sp.percent_change, sp.volume, sp.market_cap,"
+        " sp.pe_ratio, sp.pb_ratio, sp.roe, sm.*"
+        " FROM stocks s"
+        " LEFT JOIN stock_prices sp ON s.symbol = sp.symbol"
+        " LEFT JOIN stock_metrics sm ON s.symbol = sm.symbol"
+        f" WHERE {' AND '.join(where)}"
+        " ORDER BY sp.market_cap DESC NULLS LAST LIMIT ?"
+    )
+
+
+class _TTLCache:
+    """Small in-process cache whose entries expire after ``ttl`` seconds."""
+    
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[Any, Tuple[float, Any]] = {}
+    
+    def get(self, key: Any) -> Any:
+        """Return the cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+    
+    def set(self, key: Any, value: Any):
+        now = time.monotonic()
+        if len(self._entries) >= self.maxsize:
+            self._entries = {k: e for k, e in self._entries.items() if e[0] >= now}
+            # Still full: drop the oldest entry (dicts keep insertion order)
+            if len(self._entries) >= self.maxsize:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + self.ttl, value)
+    
+    def clear(self):
+        self._entries.clear()
+
+
 class Database:
     """
     Async database manager for VnStock data.
@@ -27,6 +858,29 @@ class Database:
         self.db_path = db_path or settings.DATABASE_PATH
         self._initialized = False
         
+        # Lookups behind UI dropdowns; cleared whenever stocks are written
+        self._lookup_cache = _TTLCache(settings.DB_LOOKUP_CACHE_TTL)
+        # Screener totals, keyed on the filter signature and values, so
+        # paging through the same result doesn't recount it every time
+        self._count_cache = _TTLCache(settings.DB_COUNT_CACHE_TTL)
+        
+        # One shared writer plus a pool of read-only connections, opened
+        # lazily and kept for the life of the manager
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_owner: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_conns: List[aiosqlite.Connection] = []
+        # Plain sqlite3 writer on its own thread for whole-batch writes;
+        # it shares the write lock with the aiosqlite writer
+        self._sync_writer: Optional[sqlite3.Connection] = None
+        self._writer_executor: Optional[ThreadPoolExecutor] = None
+        # Plain sqlite3 read-only connections, one per reader thread, for
+        # small lookups that fit in a single executor call
+        self._reader_executor: Optional[ThreadPoolExecutor] = None
+        self._sync_readers = threading.local()
+        self._sync_reader_conns: List[sqlite3.Connection] = []
+        
         # Ensure directory exists
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
     
@@ -38,11 +892,46 @@ class Database:
         schema_path = Path(__file__).parent / "database_schema.sql"
         
         if schema_path.exists():
-            async with aiosqlite.connect(self.db_path) as db:
+            # Set up the schema on what becomes the shared writer, so the
+            # first request reuses this connection and its warm cache
+            db = await self._open()
+            try:
+                async with db.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'stocks_fts'"
+                ) as cursor:
+                    has_fts = await cursor.fetchone() is not None
+                
+                # CREATE TABLE IF NOT EXISTS won't add columns to an existing
+                # stocks table, and the schema indexes them, so add them first
+                async with db.execute("PRAGMA table_info(stocks)") as cursor:
+                    stock_columns = {row[1] for row in await cursor.fetchall()}
+                backfill_effective = bool(stock_columns) and 'effective_market_cap' not in stock_columns
+                # Page size only takes effect before the first table exists
+                if not stock_columns:
+                    await db.execute("PRAGMA page_size=8192")
+                if backfill_effective:
+                    await db.execute("ALTER TABLE stocks ADD COLUMN effective_market_cap REAL")
+                    await db.execute("ALTER TABLE stocks ADD COLUMN effective_price REAL")
+                
                 with open(schema_path, 'r', encoding='utf-8') as f:
                     schema = f.read()
                 await db.executescript(schema)
+                
+                # Index listings that predate the search table
+                if not has_fts:
+                    await db.execute("INSERT INTO stocks_fts(stocks_fts) VALUES ('rebuild')")
+                # Fill the trigger-maintained columns for existing prices
+                if backfill_effective:
+                    await db.execute(_BACKFILL_EFFECTIVE_COLUMNS)
                 await db.commit()
+                # WAL mode is persistent, so setting it once here is enough
+                await db.execute("PRAGMA journal_mode=WAL")
+                # Gather planner stats for any index the schema just added
+                await db.execute("PRAGMA optimize")
+            except BaseException:
+                await db.close()
+                raise
+            self._writer = db
             
             logger.info(f"✅ Database initialized: {self.db_path}")
         else:
@@ -50,15 +939,258 @@ class Database:
         
         self._initialized = True
     
+    async def _open(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a long-lived connection with the shared PRAGMAs applied."""
+        if read_only:
+            conn = aiosqlite.connect(
+                Path(self.db_path).resolve().as_uri() + "?mode=ro",
+                uri=True,
+                cached_statements=_CACHED_STATEMENTS,
+            )
+        else:
+            conn = aiosqlite.connect(self.db_path, cached_statements=_CACHED_STATEMENTS)
+        # Pooled connections live for the whole process; don't let their
+        # worker threads block interpreter exit
+        conn.daemon = True
+        db = await conn
+        # Pooled readers return plain tuples; their callers build dicts
+        # from cursor.description in one pass
+        db.row_factory = None if read_only else aiosqlite.Row
+        pragmas = _CONNECTION_PRAGMAS + (_READER_PRAGMAS if read_only else _WRITER_PRAGMAS)
+        for pragma in pragmas:
+            await db.execute(pragma)
+        return db
+    
     @asynccontextmanager
-    async def connection(self):
-        """Get async database connection."""
-        if not self._initialized:
-            await self.initialize()
+    async def writer(self):
+        """
+        Get the shared writer connection.
+        
+        Access is serialized by a lock; nested use from the task that
+        already holds it (e.g. a helper called inside a connection block)
+        reuses the connection instead of deadlocking. A transaction left
+        open when the outermost block exits is rolled back, matching the
+        old per-call connections that discarded uncommitted work on close.
+        
+        initialize() must have been awaited first; get_database() and the
+        API lifespan both do this once at startup.
+        """
+        assert self._initialized, "Database.initialize() must be awaited before use"
+        
+        task = asyncio.current_task()
+        if self._writer_owner is task:
+            yield self._writer
+            return
+        
+        async with self._write_lock:
+            if self._writer is None:
+                self._writer = await self._open()
+            self._writer_owner = task
+            try:
+                yield self._writer
+            finally:
+                self._writer_owner = None
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+    
+    # Older name for writer(), used by the scripts and API routes
+    connection = writer
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Run a group of writes as one BEGIN IMMEDIATE transaction.
+        
+        upsert_* and log_update_* calls made by this task inside the block
+        join it, so related batches (e.g. listings and their prices) commit
+        together or not at all. The write lock is held for the whole block,
+        so keep network I/O outside it.
+        
+        Concurrent writes inside the block are not supported: writes from
+        other tasks (including ones started with asyncio.gather inside it)
+        wait for the lock until the block exits, so awaiting them from
+        within the block deadlocks. Run such writes one after another.
+        """
+        try:
+            async with self.writer() as db:
+                async with _write_transaction(db):
+                    yield db
+        finally:
+            # Lookups cached mid-block saw state that was committed or
+            # rolled back since
+            self._lookup_cache.clear()
+            self._count_cache.clear()
+    
+    @asynccontextmanager
+    async def reader(self):
+        """
+        Borrow a read-only connection from the pool.
         
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        In WAL mode readers never block the writer or each other. Rows come
+        back as plain tuples.
+        """
+        assert self._initialized, "Database.initialize() must be awaited before use"
+        
+        # close() may reset self._readers while this connection is on loan
+        readers = self._readers
+        if readers is None:
+            readers = self._readers = asyncio.Queue()
+            for _ in range(max(1, settings.DATABASE_READ_CONNECTIONS)):
+                conn = await self._open(read_only=True)
+                self._reader_conns.append(conn)
+                readers.put_nowait(conn)
+        
+        db = await readers.get()
+        try:
             yield db
+        finally:
+            readers.put_nowait(db)
+    
+    def _open_sync_writer(self) -> sqlite3.Connection:
+        """Open the sqlite3 batch writer (runs on the writer executor thread)."""
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, cached_statements=_CACHED_STATEMENTS
+        )
+        for pragma in _CONNECTION_PRAGMAS + _WRITER_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    async def _write_batch(self, sql: str, params: Any) -> int:
+        """
+        Run an executemany batch as a single work item on the writer thread.
+        
+        Through aiosqlite, BEGIN, the batch and COMMIT each take a round
+        trip to its thread; here the whole transaction is one executor call.
+        The write lock is taken through writer(), so the two writers never
+        overlap. If the calling task already has a transaction open on
+        writer(), the batch joins it instead. Returns the rows changed.
+        """
+        async with self.writer() as db:
+            if db.in_transaction:
+                cursor = await db.executemany(sql, params)
+                return cursor.rowcount
+            return await self._run_sync_writer(_sync_write_batch, sql, params)
+    
+    async def _write_bulk(
+        self,
+        table: str,
+        columns: Tuple[str, ...],
+        conflict: Tuple[str, ...],
+        params: Sequence[Sequence[Any]],
+    ):
+        """
+        Multi-row upsert of a large batch as a single work item on the
+        writer thread, with the same locking and joining as _write_batch.
+        """
+        async with self.writer() as db:
+            if db.in_transaction:
+                await _upsert_multi_row(db, table, columns, conflict, params)
+                return
+            await self._run_sync_writer(_sync_upsert_multi_row, table, columns, conflict, params)
+    
+    async def _run_sync_writer(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn(sync_writer, *args) on the writer thread; hold the write lock."""
+        loop = asyncio.get_running_loop()
+        if self._writer_executor is None:
+            self._writer_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="sqlite-writer"
+            )
+        if self._sync_writer is None:
+            self._sync_writer = await loop.run_in_executor(
+                self._writer_executor, self._open_sync_writer
+            )
+        return await loop.run_in_executor(self._writer_executor, fn, self._sync_writer, *args)
+    
+    def _sync_reader(self) -> sqlite3.Connection:
+        """This reader thread's sqlite3 connection, opened on first use."""
+        conn = getattr(self._sync_readers, 'conn', None)
+        if conn is None:
+            # check_same_thread is off only so close() can release it
+            conn = sqlite3.connect(
+                Path(self.db_path).resolve().as_uri() + "?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=_CACHED_STATEMENTS,
+            )
+            for pragma in _CONNECTION_PRAGMAS + _READER_PRAGMAS:
+                conn.execute(pragma)
+            self._sync_readers.conn = conn
+            self._sync_reader_conns.append(conn)
+        return conn
+    
+    def _sync_fetchall(self, sql: str, params: Sequence[Any]) -> Tuple[sqlite3.Cursor, List[tuple]]:
+        cursor = self._sync_reader().execute(sql, params)
+        return cursor, cursor.fetchall()
+    
+    async def _fetchall(self, sql: str, params: Sequence[Any] = ()) -> Tuple[sqlite3.Cursor, List[tuple]]:
+        """
+        Run a small SELECT as a single work item on a reader thread.
+        
+        Through aiosqlite, execute and fetch each take a round trip to the
+        connection's thread; here the query and its rows are one executor
+        call. Returns the cursor (for its description) and the rows as
+        plain tuples. Use reader() for results worth streaming.
+        """
+        assert self._initialized, "Database.initialize() must be awaited before use"
+        
+        if self._reader_executor is None:
+            self._reader_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.DATABASE_READ_CONNECTIONS),
+                thread_name_prefix="sqlite-reader",
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._reader_executor, self._sync_fetchall, sql, params
+        )
+    
+    async def close(self):
+        """
+        Close the pooled connections.
+        
+        Waits for borrowed readers to be returned, so call it outside any
+        reader() block (or iter_* loop) of the calling task.
+        """
+        if self._writer is not None or self._sync_writer is not None:
+            async with self._write_lock:
+                if self._writer is not None:
+                    await self._writer.close()
+                    self._writer = None
+                if self._sync_writer is not None:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self._writer_executor, self._sync_writer.close
+                    )
+                    self._sync_writer = None
+        if self._writer_executor is not None:
+            self._writer_executor.shutdown(wait=False)
+            self._writer_executor = None
+        
+        if self._reader_executor is not None:
+            # Let in-flight lookups finish before their connections close
+            await asyncio.to_thread(self._reader_executor.shutdown)
+            self._reader_executor = None
+        for sync_conn in self._sync_reader_conns:
+            sync_conn.close()
+        self._sync_reader_conns.clear()
+        self._sync_readers = threading.local()
+        
+        if self._readers is not None:
+            # Take every reader back before closing it
+            for _ in self._reader_conns:
+                await self._readers.get()
+        for conn in self._reader_conns:
+            await conn.close()
+        self._reader_conns.clear()
+        self._readers = None
+    
+    async def shutdown(self):
+        """Refresh query planner statistics and close connections."""
+        if not self._initialized:
+            return
+        
+        async with self.connection() as db:
+            await db.execute("PRAGMA optimize")
+        await self.close()
+        
+        logger.info("🧹 Database optimized")
     
     # =========================================
     # Stock Operations
@@ -69,30 +1201,17 @@ class Database:
         if not stocks:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO stocks 
-            (symbol, company_name, exchange, sector, industry, 
-             listing_date, shares_outstanding, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'company_name', 'exchange', 'sector', 'industry',
+                   'listing_date', 'shares_outstanding', 'updated_at')
         
+        now = datetime.now().isoformat()
         async with self.connection() as db:
-            params = [
-                (
-                    s.get('symbol'),
-                    s.get('company_name'),
-                    s.get('exchange'),
-                    s.get('sector'),
-                    s.get('industry'),
-                    s.get('listing_date'),
-                    s.get('shares_outstanding'),
-                    datetime.now().isoformat()
-                )
-                for s in stocks
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [(*map(s.get, columns[:-1]), now) for s in stocks]
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'stocks', columns, ('symbol',), params)
             
+            self._lookup_cache.clear()
+            self._count_cache.clear()
             logger.info(f"📥 Upserted {len(stocks)} stocks")
             return len(stocks)
     
@@ -101,60 +1220,25 @@ class Database:
         if not prices:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO stock_prices 
-            (symbol, current_price, price_change, percent_change,
-             open_price, high_price, low_price, close_price,
-             volume, market_cap, pe_ratio, pb_ratio,
-             eps, bvps, roe, roa, revenue, profit,
-             book_value, ps_ratio, total_debt, owner_equity,
-             total_assets, debt_to_equity, equity_to_assets,
-             cash, foreign_ownership, avg_volume_52w, listed_shares,
-             data_source, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = _STOCK_PRICE_COLUMNS + ('bvps', 'data_source', 'updated_at')
+        now = datetime.now().isoformat()
         
         async with self.connection() as db:
             params = [
                 (
-                    p.get('symbol'),
-                    p.get('current_price'),
-                    p.get('price_change'),
-                    p.get('percent_change'),
-                    p.get('open_price'),
-                    p.get('high_price'),
-                    p.get('low_price'),
-                    p.get('close_price'),
-                    p.get('volume'),
-                    p.get('market_cap'),
-                    p.get('pe_ratio'),
-                    p.get('pb_ratio'),
-                    p.get('eps'),
+                    *map(p.get, _STOCK_PRICE_COLUMNS),
                     p.get('bvps') or p.get('book_value'),  # Alias for compatibility
-                    p.get('roe'),
-                    p.get('roa'),
-                    p.get('revenue'),
-                    p.get('profit'),
-                    # Cophieu68 specific fields
-                    p.get('book_value'),
-                    p.get('ps_ratio'),
-                    p.get('total_debt'),
-                    p.get('owner_equity'),
-                    p.get('total_assets'),
-                    p.get('debt_to_equity'),
-                    p.get('equity_to_assets'),
-                    p.get('cash'),
-                    p.get('foreign_ownership'),
-                    p.get('avg_volume_52w'),
-                    p.get('listed_shares'),
                     p.get('data_source', 'vnstock'),
-                    datetime.now().isoformat()
+                    now,
                 )
                 for p in prices
             ]
-            await db.executemany(query, params)
-            await db.commit()
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'stock_prices', columns, ('symbol',), params)
             
+            # Screener counts read these ratios and the effective_* columns
+            # the stock_prices triggers maintain
+            self._count_cache.clear()
             logger.info(f"📥 Upserted {len(prices)} stock prices")
             return len(prices)
     
@@ -163,29 +1247,20 @@ class Database:
         if not history:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO price_history 
-            (symbol, date, open_price, high_price, low_price, 
-             close_price, volume, adjusted_close)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'date', 'open_price', 'high_price', 'low_price',
+                   'close_price', 'volume', 'adjusted_close')
         
         async with self.connection() as db:
-            params = [
-                (
-                    h.get('symbol'),
-                    h.get('date'),
-                    h.get('open_price'),
-                    h.get('high_price'),
-                    h.get('low_price'),
-                    h.get('close_price'),
-                    h.get('volume'),
-                    h.get('adjusted_close')
-                )
-                for h in history
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(h.get, columns)) for h in history]
+            if len(params) >= _BULK_LOAD_ROWS:
+                await self._write_bulk('price_history', columns, ('symbol', 'date'), params)
+            else:
+                async with _write_transaction(db):
+                    await _upsert_multi_row(db, 'price_history', columns, ('symbol', 'date'), params)
+            
+            # Inside a caller's transaction() the rows aren't committed yet
+            if len(history) >= _WAL_TRUNCATE_ROWS and not db.in_transaction:
+                await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             
             return len(history)
     
@@ -205,90 +1280,82 @@ class Database:
         market_cap_min: Optional[float] = None,
         search: Optional[str] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        after_symbol: Optional[str] = None,
+        after_market_cap: Optional[float] = None,
     ) -> List[Dict[str, Any]]:
         """Get stocks with optional filters."""
-        
-        query = """
-            SELECT 
-                s.symbol,
-                s.company_name,
-                s.exchange,
-                s.sector,
-                s.industry,
-                sp.current_price,
-                sp.price_change,
-                sp.percent_change,
-                sp.volume,
-                sp.market_cap,
-                sp.pe_ratio,
-                sp.pb_ratio,
-                sp.roe,
-                sp.roa,
-                sp.eps,
-                sp.revenue,
-                sp.profit,
-                sp.total_assets,
-                sp.total_debt,
-                sp.owner_equity,
-                sp.cash,
-                sp.debt_to_equity,
-                sp.foreign_ownership,
-                sp.updated_at
-            FROM stocks s
-            LEFT JOIN stock_prices sp ON s.symbol = sp.symbol
-            WHERE s.is_active = 1
+        return [
+            stock async for stock in self.iter_stocks(
+                exchange=exchange,
+                sector=sector,
+                pe_min=pe_min,
+                pe_max=pe_max,
+                pb_min=pb_min,
+                pb_max=pb_max,
+                roe_min=roe_min,
+                market_cap_min=market_cap_min,
+                search=search,
+                limit=limit,
+                offset=offset,
+                after_symbol=after_symbol,
+                after_market_cap=after_market_cap,
+            )
+        ]
+    
+    async def iter_stocks(
+        self,
+        exchange: Optional[str] = None,
+        sector: Optional[str] = None,
+        pe_min: Optional[float] = None,
+        pe_max: Optional[float] = None,
+        pb_min: Optional[float] = None,
+        pb_max: Optional[float] = None,
+        roe_min: Optional[float] = None,
+        market_cap_min: Optional[float] = None,
+        search: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        after_symbol: Optional[str] = None,
+        after_market_cap: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
+        Stream stocks matching the filters without holding the full result.
         
-        params = []
-        
-        if exchange:
-            query += " AND s.exchange = ?"
-            params.append(exchange)
-        
-        if sector:
-            query += " AND s.sector = ?"
-            params.append(sector)
-        
-        if pe_min is not None:
-            query += " AND sp.pe_ratio >= ?"
-            params.append(pe_min)
-        
-        if pe_max is not None:
-            query += " AND sp.pe_ratio <= ?"
-            params.append(pe_max)
-        
-        if pb_min is not None:
-            query += " AND sp.pb_ratio >= ?"
-            params.append(pb_min)
-        
-        if pb_max is not None:
-            query += " AND sp.pb_ratio <= ?"
-            params.append(pb_max)
-        
-        if roe_min is not None:
-            query += " AND sp.roe >= ?"
-            params.append(roe_min)
-        
-        if market_cap_min is not None:
-            query += " AND sp.market_cap >= ?"
-            params.append(market_cap_min)
-        
+        Rows are ordered by market cap, then symbol. Passing the last row's
+        ``symbol`` and ``market_cap`` as ``after_symbol``/``after_market_cap``
+        continues after it, without skipping ``offset`` rows first.
+        """
+        filters = locals()
+        signature = _list_signature(_STOCK_LIST_FILTERS, filters)
+        params = [filters[name] for name in signature]
+        search_clause = None
         if search:
-            query += " AND (s.symbol LIKE ? OR s.company_name LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-        
-        query += " ORDER BY sp.market_cap DESC NULLS LAST"
-        query += f" LIMIT {limit} OFFSET {offset}"
-        
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            
-            return [dict(row) for row in rows]
+            search_clause, search_params = _stock_search_clause(search)
+            params.extend(search_params)
+        after = None
+        if after_symbol is not None:
+            if after_market_cap is None:
+                after = 'null'
+                params.append(after_symbol)
+            else:
+                after = 'value'
+                params.extend([after_market_cap, after_market_cap, after_symbol])
+        query = _stock_list_query(signature, search_clause, after)
+        params.extend([limit, offset])
+        
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                async for stock in _iter_dicts(cursor):
+                    yield stock
     
     async def get_stock_count(self, exchange: Optional[str] = None) -> int:
         """Get total stock count."""
+        cache_key = ('stock_count', exchange)
+        cached = self._lookup_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         query = "SELECT COUNT(*) as count FROM stocks WHERE is_active = 1"
         params = []
         
@@ -296,13 +1363,19 @@ class Database:
             query += " AND exchange = ?"
             params.append(exchange)
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            row = await cursor.fetchone()
-            return row['count'] if row else 0
+        _, rows = await self._fetchall(query, params)
+        count = rows[0][0] if rows else 0
+        
+        self._lookup_cache.set(cache_key, count)
+        return count
     
     async def get_stock_symbols(self, exchange: Optional[str] = None) -> List[str]:
         """Get list of stock symbols."""
+        cache_key = ('stock_symbols', exchange)
+        cached = self._lookup_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
         query = "SELECT symbol FROM stocks WHERE is_active = 1"
         params = []
         
@@ -310,35 +1383,38 @@ class Database:
             query += " AND exchange = ?"
             params.append(exchange)
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [row['symbol'] for row in rows]
+        _, rows = await self._fetchall(query, params)
+        symbols = [row[0] for row in rows]
+        
+        self._lookup_cache.set(cache_key, symbols)
+        return list(symbols)
     
     async def get_sectors(self) -> List[str]:
         """Get list of unique sectors from stocks or industry_flow."""
-        async with self.connection() as db:
-            # First try to get sectors from stocks table
-            cursor = await db.execute("""
-                SELECT DISTINCT sector FROM stocks 
-                WHERE sector IS NOT NULL AND sector != ''
-                ORDER BY sector
+        cached = self._lookup_cache.get(('sectors',))
+        if cached is not None:
+            return list(cached)
+        
+        # First try to get sectors from stocks table
+        _, rows = await self._fetchall("""
+            SELECT DISTINCT sector FROM stocks 
+            WHERE sector IS NOT NULL AND sector != ''
+            ORDER BY sector
+        """)
+        sectors = [row[0] for row in rows]
+        
+        # If no sectors in stocks, get industry names from industry_flow
+        if not sectors:
+            _, rows = await self._fetchall("""
+                SELECT DISTINCT industry_name FROM industry_flow
+                WHERE industry_name IS NOT NULL AND industry_name != ''
+                ORDER BY cashflow DESC
+                LIMIT 20
             """)
-            rows = await cursor.fetchall()
-            sectors = [row['sector'] for row in rows]
-            
-            # If no sectors in stocks, get industry names from industry_flow
-            if not sectors:
-                cursor = await db.execute("""
-                    SELECT DISTINCT industry_name FROM industry_flow
-                    WHERE industry_name IS NOT NULL AND industry_name != ''
-                    ORDER BY cashflow DESC
-                    LIMIT 20
-                """)
-                rows = await cursor.fetchall()
-                sectors = [row['industry_name'] for row in rows]
-            
-            return sectors
+            sectors = [row[0] for row in rows]
+        
+        self._lookup_cache.set(('sectors',), sectors)
+        return list(sectors)
     
     async def get_stocks_by_sector(self, sector: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get top stocks in a sector by market cap/volume."""
@@ -366,15 +1442,41 @@ class Database:
                 LIMIT ?
             """
         
-        async with self.connection() as db:
-            if sector == 'VN30':
-                cursor = await db.execute(query, (limit,))
-            else:
-                cursor = await db.execute(query, (sector, limit))
-                
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        params = (limit,) if sector == 'VN30' else (sector, limit)
+        
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
             
+    async def get_price_highlights(self, limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the top gainers and most traded stocks of the session."""
+        columns = "s.symbol, s.company_name, sp.current_price, sp.price_change, sp.percent_change, sp.volume"
+        gainers_query = f"""
+            SELECT {columns}
+            FROM stocks s
+            JOIN stock_prices sp ON s.symbol = sp.symbol
+            WHERE sp.percent_change > 0 AND sp.volume > 100000
+            ORDER BY sp.percent_change DESC
+            LIMIT ?
+        """
+        active_query = f"""
+            SELECT {columns}
+            FROM stocks s
+            JOIN stock_prices sp ON s.symbol = sp.symbol
+            WHERE sp.volume > 0
+            ORDER BY sp.volume DESC
+            LIMIT ?
+        """
+        gainers, active = await asyncio.gather(
+            self._fetchall(gainers_query, (limit,)),
+            self._fetchall(active_query, (limit,)),
+        )
+        return {
+            'gainers': _rows_to_dicts(*gainers),
+            'active': _rows_to_dicts(*active),
+        }
+    
     async def get_stocks_with_prices(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get stocks that have price data (for priority updates)."""
         query = """
@@ -390,10 +1492,10 @@ class Database:
             LIMIT ?
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (limit,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (limit,)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     async def get_price_history(
         self,
@@ -409,10 +1511,9 @@ class Database:
             LIMIT ?
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol, days))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (symbol, days)) as cursor:
+                return [row async for row in _iter_dicts(cursor)]
     
     # =========================================
     # Stock Metrics Operations
@@ -423,50 +1524,19 @@ class Database:
         if not metrics:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO stock_metrics 
-            (symbol, adtv_shares, adtv_value, volume_vs_adtv,
-             rsi_14, macd, macd_signal, macd_histogram, adx,
-             ema_20, ema_50, ema_200,
-             price_vs_ema20, ema20_vs_ema50, ema50_vs_ema200,
-             price_return_1m, price_return_3m, price_fluctuation,
-             stock_trend, net_margin, gross_margin, 
-             npat_growth_yoy, revenue_growth_yoy, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'adtv_shares', 'adtv_value', 'volume_vs_adtv',
+                   'rsi_14', 'macd', 'macd_signal', 'macd_histogram', 'adx',
+                   'ema_20', 'ema_50', 'ema_200',
+                   'price_vs_ema20', 'ema20_vs_ema50', 'ema50_vs_ema200',
+                   'price_return_1m', 'price_return_3m', 'price_fluctuation',
+                   'stock_trend', 'net_margin', 'gross_margin',
+                   'npat_growth_yoy', 'revenue_growth_yoy', 'updated_at')
         
+        now = datetime.now().isoformat()
         async with self.connection() as db:
-            params = [
-                (
-                    m.get('symbol'),
-                    m.get('adtv_shares'),
-                    m.get('adtv_value'),
-                    m.get('volume_vs_adtv'),
-                    m.get('rsi_14'),
-                    m.get('macd'),
-                    m.get('macd_signal'),
-                    m.get('macd_histogram'),
-                    m.get('adx'),
-                    m.get('ema_20'),
-                    m.get('ema_50'),
-                    m.get('ema_200'),
-                    m.get('price_vs_ema20'),
-                    m.get('ema20_vs_ema50'),
-                    m.get('ema50_vs_ema200'),
-                    m.get('price_return_1m'),
-                    m.get('price_return_3m'),
-                    m.get('price_fluctuation'),
-                    m.get('stock_trend'),
-                    m.get('net_margin'),
-                    m.get('gross_margin'),
-                    m.get('npat_growth_yoy'),
-                    m.get('revenue_growth_yoy'),
-                    datetime.now().isoformat(),
-                )
-                for m in metrics
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [(*map(m.get, columns[:-1]), now) for m in metrics]
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'stock_metrics', columns, ('symbol',), params)
             
             logger.info(f"📥 Upserted {len(metrics)} stock metrics")
             return len(metrics)
@@ -475,10 +1545,10 @@ class Database:
         """Get calculated metrics for a specific stock."""
         query = "SELECT * FROM stock_metrics WHERE symbol = ?"
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol,))
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        async with self.reader() as db:
+            async with db.execute(query, (symbol,)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)[0] if rows else None
     
     async def get_stocks_with_metrics(
         self,
@@ -489,39 +1559,34 @@ class Database:
         limit: int = 100
     ) -> List[Dict[str, Any]]:
         """Get stocks filtered by technical metrics."""
-        query = """
-            SELECT 
-                s.symbol, s.company_name, s.exchange, s.sector,
-                sp.current_price, sp.percent_change, sp.volume, sp.market_cap,
-                sp.pe_ratio, sp.pb_ratio, sp.roe,
-                sm.*
-            FROM stocks s
-            LEFT JOIN stock_prices sp ON s.symbol = sp.symbol
-            LEFT JOIN stock_metrics sm ON s.symbol = sm.symbol
-            WHERE s.is_active = 1
-        """
-        params = []
-        
-        if rsi_min is not None:
-            query += " AND sm.rsi_14 >= ?"
-            params.append(rsi_min)
-        if rsi_max is not None:
-            query += " AND sm.rsi_14 <= ?"
-            params.append(rsi_max)
-        if trend:
-            query += " AND sm.stock_trend = ?"
-            params.append(trend)
-        if adx_min is not None:
-            query += " AND sm.adx >= ?"
-            params.append(adx_min)
-        
-        query += " ORDER BY sp.market_cap DESC NULLS LAST LIMIT ?"
-        params.append(limit)
-        
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        return [
+            stock async for stock in self.iter_stocks_with_metrics(
+                rsi_min=rsi_min,
+                rsi_max=rsi_max,
+                trend=trend,
+                adx_min=adx_min,
+                limit=limit,
+            )
+        ]
+    
+    async def iter_stocks_with_metrics(
+        self,
+        rsi_min: Optional[float] = None,
+        rsi_max: Optional[float] = None,
+        trend: Optional[str] = None,
+        adx_min: Optional[float] = None,
+        limit: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream stocks filtered by technical metrics."""
+        filters = locals()
+        signature = _list_signature(_METRIC_LIST_FILTERS, filters)
+        query = _metric_list_query(signature)
+        params = [filters[name] for name in signature] + [limit]
+        
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                async for stock in _iter_dicts(cursor):
+                    yield stock
     
     # =========================================
     # Statistics & Health
@@ -529,46 +1594,53 @@ class Database:
     
     async def get_database_stats(self) -> Dict[str, Any]:
         """Get database statistics."""
-        async with self.connection() as db:
-            stats = {}
-            
-            # Count tables
-            tables = ['stocks', 'stock_prices', 'price_history', 'financial_metrics']
-            for table in tables:
-                cursor = await db.execute(f"SELECT COUNT(*) as count FROM {table}")
-                row = await cursor.fetchone()
-                stats[f"{table}_count"] = row['count'] if row else 0
-            
-            # Last update time
-            cursor = await db.execute(
-                "SELECT MAX(updated_at) as last_update FROM stock_prices"
+        # The counts scan whole tables (price_history is the big one), so
+        # health checks polling this share one result per count-cache TTL.
+        # Stock, price and screener upserts and completed ingests clear it;
+        # the price_history and financial_metrics counts may lag by a TTL.
+        cached = self._count_cache.get(('database_stats',))
+        if cached is not None:
+            return dict(cached)
+        
+        # One round trip for all table counts and the last price update
+        query = """
+            SELECT
+                (SELECT COUNT(*) FROM stocks) AS stocks_count,
+                (SELECT COUNT(*) FROM stock_prices) AS stock_prices_count,
+                (SELECT COUNT(*) FROM price_history) AS price_history_count,
+                (SELECT COUNT(*) FROM financial_metrics) AS financial_metrics_count,
+                (SELECT MAX(updated_at) FROM stock_prices) AS last_price_update
+        """
+        
+        cursor, rows = await self._fetchall(query)
+        stats = _rows_to_dicts(cursor, rows)[0]
+        
+        # Database file size
+        db_path = Path(self.db_path)
+        if db_path.exists():
+            stats['database_size_mb'] = round(
+                db_path.stat().st_size / (1024 * 1024), 2
             )
-            row = await cursor.fetchone()
-            stats['last_price_update'] = row['last_update'] if row else None
-            
-            # Database file size
-            db_path = Path(self.db_path)
-            if db_path.exists():
-                stats['database_size_mb'] = round(
-                    db_path.stat().st_size / (1024 * 1024), 2
-                )
-            
-            return stats
+        
+        self._count_cache.set(('database_stats',), stats)
+        return dict(stats)
     
     async def get_data_freshness(self) -> str:
         """Check data freshness status."""
-        async with self.connection() as db:
-            cursor = await db.execute(
-                "SELECT MAX(updated_at) as last_update FROM stock_prices"
-            )
-            row = await cursor.fetchone()
+        # Age is computed in SQL; updated_at is written as local time,
+        # hence the 'localtime' modifier on now
+        query = """
+            SELECT (julianday('now', 'localtime') - julianday(MAX(updated_at))) * 24.0
+            FROM stock_prices
+        """
+        async with self.reader() as db:
+            async with db.execute(query) as cursor:
+                row = await cursor.fetchone()
             
-            if not row or not row['last_update']:
+            hours_old = row[0] if row else None
+            if hours_old is None:
                 return 'no_data'
             
-            last_update = datetime.fromisoformat(row['last_update'])
-            hours_old = (datetime.now() - last_update).total_seconds() / 3600
-            
             if hours_old < settings.STALE_DATA_THRESHOLD_HOURS:
                 return 'fresh'
             elif hours_old < settings.STALE_DATA_THRESHOLD_HOURS * 2:
@@ -585,12 +1657,15 @@ class Database:
         query = """
             INSERT INTO update_logs (update_type, status, started_at)
             VALUES (?, 'started', ?)
+            RETURNING id
         """
         
         async with self.connection() as db:
-            cursor = await db.execute(query, (update_type, datetime.now().isoformat()))
-            await db.commit()
-            return cursor.lastrowid
+            async with _write_transaction(db):
+                async with db.execute(query, (update_type, datetime.now().isoformat())) as cursor:
+                    # RETURNING rows must be consumed before the commit
+                    row = await cursor.fetchone()
+            return row['id']
     
     async def log_update_complete(
         self,
@@ -601,34 +1676,33 @@ class Database:
         error_message: Optional[str] = None
     ):
         """Log the completion of an update operation."""
-        started_at_query = "SELECT started_at FROM update_logs WHERE id = ?"
-        
+        # Duration is derived from started_at inside the UPDATE itself,
+        # so completion is a single statement instead of SELECT + UPDATE.
+        query = """
+            UPDATE update_logs
+            SET status = ?, records_processed = ?, records_failed = ?,
+                error_message = ?, completed_at = ?,
+                duration_seconds = (julianday(?) - julianday(started_at)) * 86400.0
+            WHERE id = ?
+        """
+        completed_at = datetime.now().isoformat()
+
         async with self.connection() as db:
-            cursor = await db.execute(started_at_query, (log_id,))
-            row = await cursor.fetchone()
-            
-            duration = None
-            if row and row['started_at']:
-                started = datetime.fromisoformat(row['started_at'])
-                duration = (datetime.now() - started).total_seconds()
-            
-            update_query = """
-                UPDATE update_logs 
-                SET status = ?, records_processed = ?, records_failed = ?,
-                    error_message = ?, completed_at = ?, duration_seconds = ?
-                WHERE id = ?
-            """
-            
-            await db.execute(update_query, (
-                status,
-                records_processed,
-                records_failed,
-                error_message,
-                datetime.now().isoformat(),
-                duration,
-                log_id
-            ))
-            await db.commit()
+            async with _write_transaction(db):
+                await db.execute(query, (
+                    status,
+                    records_processed,
+                    records_failed,
+                    error_message,
+                    completed_at,
+                    completed_at,
+                    log_id
+                ))
+        
+        # A finished ingest may have changed listings behind our back
+        if status == 'completed':
+            self._lookup_cache.clear()
+            self._count_cache.clear()
     
     # =========================================
     # Dividend History Operations
@@ -639,29 +1713,13 @@ class Database:
         if not dividends:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO dividend_history 
-            (symbol, ex_date, record_date, payment_date, 
-             cash_dividend, stock_dividend, dividend_yield, fiscal_year)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'ex_date', 'record_date', 'payment_date',
+                   'cash_dividend', 'stock_dividend', 'dividend_yield', 'fiscal_year')
         
         async with self.connection() as db:
-            params = [
-                (
-                    d.get('symbol'),
-                    d.get('ex_date'),
-                    d.get('record_date'),
-                    d.get('payment_date'),
-                    d.get('cash_dividend'),
-                    d.get('stock_dividend'),
-                    d.get('dividend_yield'),
-                    d.get('fiscal_year'),
-                )
-                for d in dividends
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(d.get, columns)) for d in dividends]
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'dividend_history', columns, ('symbol', 'ex_date'), params)
             
             logger.info(f"📥 Upserted {len(dividends)} dividend records")
             return len(dividends)
@@ -679,10 +1737,10 @@ class Database:
             LIMIT ?
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol, limit))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (symbol, limit)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Company Ratings Operations
@@ -693,29 +1751,25 @@ class Database:
         if not ratings:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO company_ratings 
-            (symbol, rating_type, rating_value, rating_grade, 
-             criteria_scores, rating_date, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'rating_type', 'rating_value', 'rating_grade',
+                   'criteria_scores', 'rating_date', 'updated_at')
         
+        now = datetime.now().isoformat()
         async with self.connection() as db:
-            import json
             params = [
                 (
                     r.get('symbol'),
                     r.get('rating_type'),
                     r.get('rating_value'),
                     r.get('rating_grade'),
-                    json.dumps(r.get('criteria_scores')) if r.get('criteria_scores') else None,
+                    _json_text(r.get('criteria_scores')),
                     r.get('rating_date'),
-                    datetime.now().isoformat(),
+                    now,
                 )
                 for r in ratings
             ]
-            await db.executemany(query, params)
-            await db.commit()
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'company_ratings', columns, ('symbol', 'rating_type'), params)
             
             logger.info(f"📥 Upserted {len(ratings)} rating records")
             return len(ratings)
@@ -728,10 +1782,10 @@ class Database:
             ORDER BY rating_type
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (symbol,)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Intraday Prices Operations  
@@ -742,27 +1796,13 @@ class Database:
         if not prices:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO intraday_prices 
-            (symbol, timestamp, price, volume, bid_price, ask_price, total_volume)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('symbol', 'timestamp', 'price', 'volume',
+                   'bid_price', 'ask_price', 'total_volume')
         
         async with self.connection() as db:
-            params = [
-                (
-                    p.get('symbol'),
-                    p.get('timestamp'),
-                    p.get('price'),
-                    p.get('volume'),
-                    p.get('bid_price'),
-                    p.get('ask_price'),
-                    p.get('total_volume'),
-                )
-                for p in prices
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(p.get, columns)) for p in prices]
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'intraday_prices', columns, ('symbol', 'timestamp'), params)
             
             return len(prices)
     
@@ -779,10 +1819,9 @@ class Database:
             LIMIT ?
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol, limit))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (symbol, limit)) as cursor:
+                return [row async for row in _iter_dicts(cursor)]
     
     # =========================================
     # Market Indices Operations
@@ -793,31 +1832,13 @@ class Database:
         if not indices:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO market_indices 
-            (index_code, timestamp, value, change_value, change_percent,
-             volume, total_value, advances, declines, unchanged)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = ('index_code', 'timestamp', 'value', 'change_value', 'change_percent',
+                   'volume', 'total_value', 'advances', 'declines', 'unchanged')
         
         async with self.connection() as db:
-            params = [
-                (
-                    idx.get('index_code'),
-                    idx.get('timestamp'),
-                    idx.get('value'),
-                    idx.get('change_value'),
-                    idx.get('change_percent'),
-                    idx.get('volume'),
-                    idx.get('total_value'),
-                    idx.get('advances'),
-                    idx.get('declines'),
-                    idx.get('unchanged'),
-                )
-                for idx in indices
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(idx.get, columns)) for idx in indices]
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'market_indices', columns, ('index_code', 'timestamp'), params)
             
             logger.info(f"📥 Upserted {len(indices)} market index records")
             return len(indices)
@@ -833,20 +1854,37 @@ class Database:
             """
             params = (index_code,)
         else:
+            # DISTINCT over the UNIQUE(index_code, timestamp) index skips
+            # ahead per code, and each MAX() is a single index probe, so
+            # the history is never scanned in full
             query = """
-                SELECT m1.* FROM market_indices m1
-                INNER JOIN (
-                    SELECT index_code, MAX(timestamp) as max_ts
-                    FROM market_indices
-                    GROUP BY index_code
-                ) m2 ON m1.index_code = m2.index_code AND m1.timestamp = m2.max_ts
+                SELECT m.* FROM (SELECT DISTINCT index_code FROM market_indices) c
+                JOIN market_indices m
+                    ON m.index_code = c.index_code
+                    AND m.timestamp = (
+                        SELECT MAX(timestamp) FROM market_indices
+                        WHERE index_code = c.index_code
+                    )
             """
             params = ()
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        cursor, rows = await self._fetchall(query, params)
+        return _rows_to_dicts(cursor, rows)
+    
+    # =========================================
+    # Daily Orderflow Operations
+    # =========================================
+    
+    async def get_daily_orderflow(self, symbol: str, days: int = 30) -> List[Dict[str, Any]]:
+        """Get the most recent daily orderflow sessions for a symbol."""
+        query = """
+            SELECT * FROM daily_orderflow
+            WHERE symbol = ?
+            ORDER BY trade_date DESC
+            LIMIT ?
+        """
+        cursor, rows = await self._fetchall(query, (symbol, days))
+        return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Screener Metrics Operations (84 columns)
@@ -857,115 +1895,17 @@ class Database:
         if not metrics:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO screener_metrics 
-            (symbol, exchange, industry, market_cap, pe_ratio, pb_ratio, ev_ebitda,
-             eps, roe, dividend_yield, gross_margin, net_margin, doe,
-             revenue_growth_1y, revenue_growth_5y, eps_growth_1y, eps_growth_5y,
-             last_quarter_revenue_growth, last_quarter_profit_growth,
-             rsi14, macd_histogram, price_vs_sma5, price_vs_sma10, price_vs_sma20,
-             price_vs_sma50, price_vs_sma100, bolling_band_signal, dmi_signal, rsi14_status,
-             vol_vs_sma5, vol_vs_sma10, vol_vs_sma20, vol_vs_sma50,
-             avg_trading_value_5d, avg_trading_value_10d, avg_trading_value_20d,
-             price_near_realtime, price_growth_1w, price_growth_1m,
-             prev_1d_growth_pct, prev_1m_growth_pct, prev_1y_growth_pct, prev_5y_growth_pct,
-             pct_away_from_hist_peak, pct_off_hist_bottom, pct_1y_from_peak, pct_1y_from_bottom,
-             relative_strength_3d, rel_strength_1m, rel_strength_3m, rel_strength_1y,
-             tc_rs, alpha, beta,
-             stock_rating, business_operation, business_model, financial_health,
-             tcbs_recommend, tcbs_buy_sell_signal,
-             foreign_vol_pct, foreign_transaction, foreign_buysell_20s,
-             uptrend, breakout, price_break_out52_week, heating_up,
-             num_increase_continuous_day, num_decrease_continuous_day,
-             profit_last_4q, free_transfer_rate, net_cash_per_market_cap,
-             net_cash_per_total_assets, has_financial_report, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        columns = _SCREENER_COLUMNS + ('updated_at',)
+        now = datetime.now().isoformat()
         
         async with self.connection() as db:
-            params = [
-                (
-                    m.get('symbol'),
-                    m.get('exchange'),
-                    m.get('industry'),
-                    m.get('market_cap'),
-                    m.get('pe_ratio'),
-                    m.get('pb_ratio'),
-                    m.get('ev_ebitda'),
-                    m.get('eps'),
-                    m.get('roe'),
-                    m.get('dividend_yield'),
-                    m.get('gross_margin'),
-                    m.get('net_margin'),
-                    m.get('doe'),
-                    m.get('revenue_growth_1y'),
-                    m.get('revenue_growth_5y'),
-                    m.get('eps_growth_1y'),
-                    m.get('eps_growth_5y'),
-                    m.get('last_quarter_revenue_growth'),
-                    m.get('last_quarter_profit_growth'),
-                    m.get('rsi14'),
-                    m.get('macd_histogram'),
-                    m.get('price_vs_sma5'),
-                    m.get('price_vs_sma10'),
-                    m.get('price_vs_sma20'),
-                    m.get('price_vs_sma50'),
-                    m.get('price_vs_sma100'),
-                    m.get('bolling_band_signal'),
-                    m.get('dmi_signal'),
-                    m.get('rsi14_status'),
-                    m.get('vol_vs_sma5'),
-                    m.get('vol_vs_sma10'),
-                    m.get('vol_vs_sma20'),
-                    m.get('vol_vs_sma50'),
-                    m.get('avg_trading_value_5d'),
-                    m.get('avg_trading_value_10d'),
-                    m.get('avg_trading_value_20d'),
-                    m.get('price_near_realtime'),
-                    m.get('price_growth_1w'),
-                    m.get('price_growth_1m'),
-                    m.get('prev_1d_growth_pct'),
-                    m.get('prev_1m_growth_pct'),
-                    m.get('prev_1y_growth_pct'),
-                    m.get('prev_5y_growth_pct'),
-                    m.get('pct_away_from_hist_peak'),
-                    m.get('pct_off_hist_bottom'),
-                    m.get('pct_1y_from_peak'),
-                    m.get('pct_1y_from_bottom'),
-                    m.get('relative_strength_3d'),
-                    m.get('rel_strength_1m'),
-                    m.get('rel_strength_3m'),
-                    m.get('rel_strength_1y'),
-                    m.get('tc_rs'),
-                    m.get('alpha'),
-                    m.get('beta'),
-                    m.get('stock_rating'),
-                    m.get('business_operation'),
-                    m.get('business_model'),
-                    m.get('financial_health'),
-                    m.get('tcbs_recommend'),
-                    m.get('tcbs_buy_sell_signal'),
-                    m.get('foreign_vol_pct'),
-                    m.get('foreign_transaction'),
-                    m.get('foreign_buysell_20s'),
-                    m.get('uptrend'),
-                    m.get('breakout'),
-                    m.get('price_break_out52_week'),
-                    m.get('heating_up'),
-                    m.get('num_increase_continuous_day'),
-                    m.get('num_decrease_continuous_day'),
-                    m.get('profit_last_4q'),
-                    m.get('free_transfer_rate'),
-                    m.get('net_cash_per_market_cap'),
-                    m.get('net_cash_per_total_assets'),
-                    m.get('has_financial_report'),
-                    datetime.now().isoformat(),
+            async with _write_transaction(db):
+                await _upsert_multi_row_pipelined(
+                    db, 'screener_metrics', columns, ('symbol',), metrics,
+                    lambda m: (*map(m.get, _SCREENER_COLUMNS), now),
                 )
-                for m in metrics
-            ]
-            await db.executemany(query, params)
-            await db.commit()
             
+            self._count_cache.clear()
             logger.info(f"📥 Upserted {len(metrics)} screener metric records")
             return len(metrics)
     
@@ -978,43 +1918,74 @@ class Database:
         roe_min: Optional[float] = None,
         rsi_min: Optional[float] = None,
         rsi_max: Optional[float] = None,
-        limit: int = 100
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
     ) -> List[Dict[str, Any]]:
-        """Get screener metrics with optional filters."""
-        query = "SELECT * FROM screener_metrics WHERE 1=1"
-        params = []
+        """Get screener metrics with optional filters (optionally only some columns)."""
+        filters = locals()
+        signature = _list_signature(_SCREENER_METRIC_FILTERS, filters)
+        ranked_query, unranked_query = _screener_metrics_queries(
+            signature, _column_list(columns, _SCREENER_COLUMNS + ('updated_at',))
+        )
+        params = [
+            f"%{filters[name]}%" if name == 'industry' else filters[name]
+            for name in signature
+        ]
+        
+        async with self.reader() as db:
+            async with db.execute(ranked_query, params + [limit]) as cursor:
+                metrics = _rows_to_dicts(cursor, await cursor.fetchall())
+            
+            if len(metrics) < limit:
+                async with db.execute(unranked_query, params + [limit - len(metrics)]) as cursor:
+                    metrics += _rows_to_dicts(cursor, await cursor.fetchall())
+            
+            return metrics
+    
+    async def get_symbol_screener_metrics(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Get every screener_metrics column for one symbol."""
+        cursor, rows = await self._fetchall(
+            "SELECT * FROM screener_metrics WHERE symbol = ?", (symbol,)
+        )
+        return _rows_to_dicts(cursor, rows)[0] if rows else None
+    
+    async def get_stocks_with_screener_data(self, **filters: Any) -> List[Dict[str, Any]]:
+        """
+        Get comprehensive stock data as a list.
         
-        if exchange:
-            query += " AND exchange = ?"
-            params.append(exchange)
-        if industry:
-            query += " AND industry LIKE ?"
-            params.append(f"%{industry}%")
-        if pe_min is not None:
-            query += " AND pe_ratio >= ?"
-            params.append(pe_min)
-        if pe_max is not None:
-            query += " AND pe_ratio <= ?"
-            params.append(pe_max)
-        if roe_min is not None:
-            query += " AND roe >= ?"
-            params.append(roe_min)
-        if rsi_min is not None:
-            query += " AND rsi14 >= ?"
-            params.append(rsi_min)
-        if rsi_max is not None:
-            query += " AND rsi14 <= ?"
-            params.append(rsi_max)
-        
-        query += " ORDER BY market_cap DESC NULLS LAST LIMIT ?"
-        params.append(limit)
+        Takes the same keyword arguments as iter_stocks_with_screener_data.
+        """
+        return [stock async for stock in self.iter_stocks_with_screener_data(**filters)]
+    
+    async def get_stocks_with_screener_data_raw(self, **filters: Any) -> Dict[str, Any]:
+        """
+        Get a screener page as columns plus row tuples.
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        Takes the same keyword arguments as iter_stocks_with_screener_data
+        and skips building a dict per row, for callers that serialize the
+        page straight to JSON. ``total`` is the unpaged match count, or
+        None when the page is empty.
+        """
+        unknown = filters.keys() - _SCREENER_ARGUMENTS
+        if unknown:
+            raise TypeError(
+                f"get_stocks_with_screener_data_raw() got unexpected keyword arguments: {sorted(unknown)}"
+            )
+        query, params = _screener_statement(filters)
+        
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                # total_count is the last column
+                columns = [col[0] for col in cursor.description][:-1]
+        
+        return {
+            'columns': columns,
+            'rows': [row[:-1] for row in rows],
+            'total': rows[0][-1] if rows else None,
+        }
     
-    async def get_stocks_with_screener_data(
+    async def iter_stocks_with_screener_data(
         self,
         # Basic filters
         exchange: Optional[str] = None,
@@ -1062,314 +2033,90 @@ class Database:
         # Pagination
         limit: int = 100,
         offset: int = 0
-    ) -> List[Dict[str, Any]]:
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Get comprehensive stock data by joining stocks, stock_prices, and screener_metrics.
+        Stream comprehensive stock data by joining stocks, stock_prices, and screener_metrics.
+        
+        Every row includes ``total_count``, the number of stocks matching
+        the filters regardless of limit/offset.
         
         Returns all metrics needed for advanced screening:
         - General: market_cap, price, price_change, adtv
         - Technical: rsi, macd, stock_rating, relative_strength, trends
         - Financial: pe, pb, roe, margins, growth rates
         """
-        query = """
-            SELECT 
-                s.symbol,
-                s.company_name,
-                s.exchange,
-                s.sector,
-                s.industry,
-                -- Price data (prefer screener_metrics for fresh data)
-                COALESCE(sm.price_near_realtime, sp.current_price) as current_price,
-                sp.price_change,
-                COALESCE(sm.prev_1d_growth_pct, sp.percent_change) as percent_change,
-                sp.volume,
-                -- General metrics
-                COALESCE(sm.market_cap, sp.market_cap) as market_cap,
-                sm.avg_trading_value_20d as adtv_value,
-                sm.vol_vs_sma20 as volume_vs_adtv,
-                -- Technical signals
-                sm.stock_rating,
-                COALESCE(stm.rel_strength_1m, sm.rel_strength_3m) as relative_strength,
-                sm.tc_rs,
-                COALESCE(stm.rsi_14, sm.rsi14) as rsi,
-                sm.rsi14_status,
-                sm.price_vs_sma5,
-                sm.price_vs_sma10,
-                COALESCE(stm.price_vs_ema20, sm.price_vs_sma20) as price_vs_sma20,
-                sm.price_vs_sma50,
-                sm.price_vs_sma100,
-                COALESCE(stm.macd_histogram, sm.macd_histogram) as macd_histogram,
-                stm.macd,
-                stm.macd_signal,
-                stm.adx,
-                stm.stock_trend,
-                
-                -- Signals (Mapped)
-                CASE WHEN stm.stock_trend IN ('uptrend', 'strong_uptrend') THEN 1 ELSE 0 END as uptrend,
-                CASE WHEN stm.stock_trend = 'breakout' THEN 1 ELSE 0 END as breakout,
-                
-                sm.bolling_band_signal,
-                sm.dmi_signal,
-                sm.price_break_out52_week,
-                sm.heating_up,
-                -- Price performance
-                sm.price_growth_1w,
-                sm.price_growth_1m,
-                sm.prev_1m_growth_pct as price_return_1m,
-                sm.rel_strength_1m as price_return_outperform_1m,
-                sm.prev_1y_growth_pct as price_return_1y,
-                sm.pct_away_from_hist_peak,
-                sm.pct_off_hist_bottom,
-                -- Financial indicators
-                COALESCE(sm.pe_ratio, sp.pe_ratio) as pe_ratio,
-                COALESCE(sm.pb_ratio, sp.pb_ratio) as pb_ratio,
-                COALESCE(sm.roe, sp.roe) as roe,
-                sm.eps,
-                sp.revenue,
-                sp.profit,
-                sp.total_assets,
-                sp.total_debt,
-                sp.owner_equity,
-                sp.cash,
-                sp.debt_to_equity,
-                sp.foreign_ownership,
-                sm.dividend_yield,
-                COALESCE(sm.gross_margin, CASE WHEN sp.revenue > 0 THEN ((sp.revenue - sp.profit) / sp.revenue * 100) ELSE NULL END) as gross_margin, -- Rough estimate if missing
-                COALESCE(sm.net_margin, CASE WHEN sp.revenue > 0 THEN (sp.profit / sp.revenue * 100) ELSE NULL END) as net_margin,
-                sm.doe as debt_equity,
-                -- Growth metrics
-                sm.revenue_growth_1y,
-                sm.eps_growth_1y,
-                sm.last_quarter_revenue_growth,
-                sm.last_quarter_profit_growth as npat_growth,
-                -- TCBS ratings
-                sm.financial_health,
-                sm.business_model,
-                sm.business_operation,
-                sm.tcbs_recommend,
-                -- Foreign activity
-                sm.foreign_vol_pct,
-                sm.foreign_buysell_20s,
-                -- Metadata
-                sm.updated_at as screener_updated_at
-            FROM stocks s
-            LEFT JOIN stock_prices sp ON s.symbol = sp.symbol
-            LEFT JOIN screener_metrics sm ON s.symbol = sm.symbol
-            LEFT JOIN stock_metrics stm ON s.symbol = stm.symbol
-            WHERE s.is_active = 1
-        """
-        params = []
-        
-        # Basic filters
-        if exchange:
-            query += " AND s.exchange = ?"
-            params.append(exchange)
-        if sector:
-            query += " AND s.sector = ?"
-            params.append(sector)
-        if industry:
-            query += " AND sm.industry LIKE ?"
-            params.append(f"%{industry}%")
-        if search:
-            query += " AND (s.symbol LIKE ? OR s.company_name LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-        
-        # General metrics
-        if market_cap_min is not None:
-            query += " AND COALESCE(sm.market_cap, sp.market_cap) >= ?"
-            params.append(market_cap_min)
-        if market_cap_max is not None:
-            query += " AND COALESCE(sm.market_cap, sp.market_cap) <= ?"
-            params.append(market_cap_max)
-        if price_min is not None:
-            query += " AND COALESCE(sm.price_near_realtime, sp.current_price) >= ?"
-            params.append(price_min)
-        if price_max is not None:
-            query += " AND COALESCE(sm.price_near_realtime, sp.current_price) <= ?"
-            params.append(price_max)
-        if price_change_min is not None:
-            query += " AND sm.prev_1d_growth_pct >= ?"
-            params.append(price_change_min)
-        if price_change_max is not None:
-            query += " AND sm.prev_1d_growth_pct <= ?"
-            params.append(price_change_max)
-        if adtv_value_min is not None:
-            query += " AND sm.avg_trading_value_20d >= ?"
-            params.append(adtv_value_min)
-        if volume_vs_adtv_min is not None:
-            query += " AND sm.vol_vs_sma20 >= ?"
-            params.append(volume_vs_adtv_min)
-        
-        # Technical signals
-        if stock_rating_min is not None:
-            query += " AND sm.stock_rating >= ?"
-            params.append(stock_rating_min)
-        if rs_min is not None:
-            query += " AND sm.rel_strength_3m >= ?"
-            params.append(rs_min)
-        if rs_max is not None:
-            query += " AND sm.rel_strength_3m <= ?"
-            params.append(rs_max)
-        if rsi_min is not None:
-            query += " AND sm.rsi14 >= ?"
-            params.append(rsi_min)
-        if rsi_max is not None:
-            query += " AND sm.rsi14 <= ?"
-            params.append(rsi_max)
-        if price_vs_sma20_min is not None:
-            query += " AND sm.price_vs_sma20 >= ?"
-            params.append(price_vs_sma20_min)
-        if price_vs_sma20_max is not None:
-            query += " AND sm.price_vs_sma20 <= ?"
-            params.append(price_vs_sma20_max)
-        if macd_histogram_min is not None:
-            query += " AND sm.macd_histogram >= ?"
-            params.append(macd_histogram_min)
-        if adx_min is not None:
-            # Note: ADX not in screener_metrics, would need stock_metrics table
-            pass
-        if stock_trend == 'uptrend':
-            query += " AND sm.uptrend = 1"
-        elif stock_trend == 'breakout':
-            query += " AND sm.breakout = 1"
-        elif stock_trend == 'heating_up':
-            query += " AND sm.heating_up = 1"
-        if price_return_1m_min is not None:
-            query += " AND sm.prev_1m_growth_pct >= ?"
-            params.append(price_return_1m_min)
-        if price_return_1m_max is not None:
-            query += " AND sm.prev_1m_growth_pct <= ?"
-            params.append(price_return_1m_max)
-        if price_return_3m_min is not None:
-            query += " AND sm.rel_strength_3m >= ?"
-            params.append(price_return_3m_min)
-        
-        # Financial indicators
-        if pe_min is not None:
-            query += " AND COALESCE(sm.pe_ratio, sp.pe_ratio) >= ?"
-            params.append(pe_min)
-        if pe_max is not None:
-            query += " AND COALESCE(sm.pe_ratio, sp.pe_ratio) <= ?"
-            params.append(pe_max)
-        if pb_min is not None:
-            query += " AND COALESCE(sm.pb_ratio, sp.pb_ratio) >= ?"
-            params.append(pb_min)
-        if pb_max is not None:
-            query += " AND COALESCE(sm.pb_ratio, sp.pb_ratio) <= ?"
-            params.append(pb_max)
-        if roe_min is not None:
-            query += " AND COALESCE(sm.roe, sp.roe) >= ?"
-            params.append(roe_min)
-        if roe_max is not None:
-            query += " AND COALESCE(sm.roe, sp.roe) <= ?"
-            params.append(roe_max)
-        if revenue_growth_min is not None:
-            query += " AND sm.revenue_growth_1y >= ?"
-            params.append(revenue_growth_min)
-        if npat_growth_min is not None:
-            query += " AND sm.last_quarter_profit_growth >= ?"
-            params.append(npat_growth_min)
-        if net_margin_min is not None:
-            query += " AND sm.net_margin >= ?"
-            params.append(net_margin_min)
-        if gross_margin_min is not None:
-            query += " AND sm.gross_margin >= ?"
-            params.append(gross_margin_min)
-        if dividend_yield_min is not None:
-            query += " AND sm.dividend_yield >= ?"
-            params.append(dividend_yield_min)
-        
-        # Sort Mapping
-        sort_map = {
-            'market_cap': 'COALESCE(sm.market_cap, sp.market_cap)',
-            'current_price': 'COALESCE(sm.price_near_realtime, sp.current_price)',
-            'percent_change': 'COALESCE(sm.prev_1d_growth_pct, sp.percent_change)',
-            'volume': 'sp.volume',
-            'pe': 'COALESCE(sm.pe_ratio, sp.pe_ratio)',
-            'pb': 'COALESCE(sm.pb_ratio, sp.pb_ratio)',
-            'roe': 'COALESCE(sm.roe, sp.roe)',
-            'rsi': 'COALESCE(stm.rsi_14, sm.rsi14)',
-            'relativeStrength': 'sm.tc_rs', # RS Rating
-            'rsRating': 'sm.tc_rs', 
-            'stockRating': 'sm.stock_rating',
-            'revenueGrowth': 'sm.revenue_growth_1y',
-            'netMargin': 'sm.net_margin'
-        }
+        query, params = _screener_statement(locals())
         
-        sort_col = sort_map.get(sort_by, sort_map['market_cap'])
-        sort_dir = 'ASC' if order == 'asc' else 'DESC'
-        
-        query += f" ORDER BY {sort_col} {sort_dir} NULLS LAST"
-        query += f" LIMIT {limit} OFFSET {offset}"
-        
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                async for stock in _iter_dicts(cursor):
+                    yield stock
     
     async def count_stocks_with_screener_data(
         self,
+        # Basic filters
         exchange: Optional[str] = None,
         sector: Optional[str] = None,
+        industry: Optional[str] = None,
         search: Optional[str] = None,
-        # Add same filters as above for accurate count
+        # General metrics
+        market_cap_min: Optional[float] = None,
+        market_cap_max: Optional[float] = None,
+        price_min: Optional[float] = None,
+        price_max: Optional[float] = None,
+        price_change_min: Optional[float] = None,
+        price_change_max: Optional[float] = None,
+        adtv_value_min: Optional[float] = None,
+        volume_vs_adtv_min: Optional[float] = None,
+        # Technical signals
+        stock_rating_min: Optional[float] = None,
+        rs_min: Optional[float] = None,
+        rs_max: Optional[float] = None,
+        rsi_min: Optional[float] = None,
+        rsi_max: Optional[float] = None,
+        price_vs_sma20_min: Optional[float] = None,
+        price_vs_sma20_max: Optional[float] = None,
+        macd_histogram_min: Optional[float] = None,
+        adx_min: Optional[float] = None,
+        stock_trend: Optional[str] = None,
+        price_return_1m_min: Optional[float] = None,
+        price_return_1m_max: Optional[float] = None,
+        price_return_3m_min: Optional[float] = None,
+        # Financial indicators
         pe_min: Optional[float] = None,
         pe_max: Optional[float] = None,
         pb_min: Optional[float] = None,
         pb_max: Optional[float] = None,
         roe_min: Optional[float] = None,
-        rsi_min: Optional[float] = None,
-        rsi_max: Optional[float] = None,
-        market_cap_min: Optional[float] = None,
+        roe_max: Optional[float] = None,
+        revenue_growth_min: Optional[float] = None,
+        npat_growth_min: Optional[float] = None,
+        net_margin_min: Optional[float] = None,
+        gross_margin_min: Optional[float] = None,
+        dividend_yield_min: Optional[float] = None,
     ) -> int:
-        """Count stocks matching screener filters."""
-        query = """
-            SELECT COUNT(*) as count
-            FROM stocks s
-            LEFT JOIN stock_prices sp ON s.symbol = sp.symbol
-            LEFT JOIN screener_metrics sm ON s.symbol = sm.symbol
-            WHERE s.is_active = 1
         """
-        params = []
+        Count stocks matching screener filters.
         
-        if exchange:
-            query += " AND s.exchange = ?"
-            params.append(exchange)
-        if sector:
-            query += " AND s.sector = ?"
-            params.append(sector)
-        if search:
-            query += " AND (s.symbol LIKE ? OR s.company_name LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-        if pe_min is not None:
-            query += " AND COALESCE(sm.pe_ratio, sp.pe_ratio) >= ?"
-            params.append(pe_min)
-        if pe_max is not None:
-            query += " AND COALESCE(sm.pe_ratio, sp.pe_ratio) <= ?"
-            params.append(pe_max)
-        if pb_min is not None:
-            query += " AND COALESCE(sm.pb_ratio, sp.pb_ratio) >= ?"
-            params.append(pb_min)
-        if pb_max is not None:
-            query += " AND COALESCE(sm.pb_ratio, sp.pb_ratio) <= ?"
-            params.append(pb_max)
-        if roe_min is not None:
-            query += " AND COALESCE(sm.roe, sp.roe) >= ?"
-            params.append(roe_min)
-        if rsi_min is not None:
-            query += " AND sm.rsi14 >= ?"
-            params.append(rsi_min)
-        if rsi_max is not None:
-            query += " AND sm.rsi14 <= ?"
-            params.append(rsi_max)
-        if market_cap_min is not None:
-            query += " AND COALESCE(sm.market_cap, sp.market_cap) >= ?"
-            params.append(market_cap_min)
+        Takes the filter arguments of iter_stocks_with_screener_data (not
+        its ordering or paging).
+        """
+        filters = locals()
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            row = await cursor.fetchone()
-            return row['count'] if row else 0
+        signature = _screener_signature(filters)
+        params = _screener_params(signature, filters)
+        cache_key = (signature, stock_trend, tuple(params))
+        cached = self._count_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        async with self.reader() as db:
+            async with db.execute(_screener_count_query(signature, stock_trend), params) as cursor:
+                row = await cursor.fetchone()
+                count = row[0] if row else 0
+        
+        self._count_cache.set(cache_key, count)
+        return count
     
     # =========================================
     # Shareholders Operations
@@ -1380,43 +2127,32 @@ class Database:
         if not shareholders:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO shareholders 
-            (symbol, shareholder_id, shareholder_name, quantity, 
-             ownership_percent, update_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """
+        query = _upsert_query(
+            'shareholders', _SHAREHOLDER_COLUMNS, conflict=('symbol', 'shareholder_id')
+        )
         
         async with self.connection() as db:
-            params = [
-                (
-                    s.get('symbol'),
-                    s.get('shareholder_id'),
-                    s.get('shareholder_name'),
-                    s.get('quantity'),
-                    s.get('ownership_percent'),
-                    s.get('update_date'),
-                )
-                for s in shareholders
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(s.get, _SHAREHOLDER_COLUMNS)) for s in shareholders]
+            async with _write_transaction(db):
+                await db.executemany(query, params)
             
             logger.debug(f"📥 Upserted {len(shareholders)} shareholder records")
             return len(shareholders)
     
-    async def get_shareholders(self, symbol: str) -> List[Dict[str, Any]]:
-        """Get all shareholders for a symbol."""
-        query = """
-            SELECT * FROM shareholders
+    async def get_shareholders(
+        self, symbol: str, columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get all shareholders for a symbol (optionally only some columns)."""
+        query = f"""
+            SELECT {_column_list(columns, _SHAREHOLDER_READ_COLUMNS)} FROM shareholders
             WHERE symbol = ?
             ORDER BY ownership_percent DESC
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (symbol,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, (symbol,)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Officers Operations
@@ -1427,38 +2163,22 @@ class Database:
         if not officers:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO officers 
-            (symbol, officer_id, officer_name, position, position_short,
-             ownership_percent, quantity, status, update_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        query = _upsert_query('officers', _OFFICER_COLUMNS, conflict=('symbol', 'officer_id'))
         
         async with self.connection() as db:
-            params = [
-                (
-                    o.get('symbol'),
-                    o.get('officer_id'),
-                    o.get('officer_name'),
-                    o.get('position'),
-                    o.get('position_short'),
-                    o.get('ownership_percent'),
-                    o.get('quantity'),
-                    o.get('status'),
-                    o.get('update_date'),
-                )
-                for o in officers
-            ]
-            await db.executemany(query, params)
-            await db.commit()
+            params = [tuple(map(o.get, _OFFICER_COLUMNS)) for o in officers]
+            async with _write_transaction(db):
+                await db.executemany(query, params)
             
             logger.debug(f"📥 Upserted {len(officers)} officer records")
             return len(officers)
     
-    async def get_officers(self, symbol: str, status: str = 'working') -> List[Dict[str, Any]]:
-        """Get officers for a symbol by status."""
-        query = """
-            SELECT * FROM officers
+    async def get_officers(
+        self, symbol: str, status: str = 'working', columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get officers for a symbol by status (optionally only some columns)."""
+        query = f"""
+            SELECT {_column_list(columns, _OFFICER_READ_COLUMNS)} FROM officers
             WHERE symbol = ?
         """
         params = [symbol]
@@ -1469,10 +2189,10 @@ class Database:
         
         query += " ORDER BY ownership_percent DESC"
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Price Board Operations (Real-time Bid/Ask)
@@ -1483,56 +2203,15 @@ class Database:
         if not data:
             return 0
         
-        query = """
-            INSERT OR REPLACE INTO price_board 
-            (symbol, exchange, ceiling, floor, ref_price, prior_close,
-             match_price, match_volume, accumulated_volume, accumulated_value,
-             avg_match_price, highest, lowest,
-             foreign_buy_volume, foreign_sell_volume, current_room, total_room,
-             bid_1_price, bid_1_volume, bid_2_price, bid_2_volume, bid_3_price, bid_3_volume,
-             ask_1_price, ask_1_volume, ask_2_price, ask_2_volume, ask_3_price, ask_3_volume,
-             updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        now = datetime.now().isoformat()
         
         async with self.connection() as db:
             params = [
-                (
-                    d.get('symbol'),
-                    d.get('exchange'),
-                    d.get('ceiling'),
-                    d.get('floor'),
-                    d.get('ref_price'),
-                    d.get('prior_close'),
-                    d.get('match_price'),
-                    d.get('match_volume'),
-                    d.get('accumulated_volume'),
-                    d.get('accumulated_value'),
-                    d.get('avg_match_price'),
-                    d.get('highest'),
-                    d.get('lowest'),
-                    d.get('foreign_buy_volume'),
-                    d.get('foreign_sell_volume'),
-                    d.get('current_room'),
-                    d.get('total_room'),
-                    d.get('bid_1_price'),
-                    d.get('bid_1_volume'),
-                    d.get('bid_2_price'),
-                    d.get('bid_2_volume'),
-                    d.get('bid_3_price'),
-                    d.get('bid_3_volume'),
-                    d.get('ask_1_price'),
-                    d.get('ask_1_volume'),
-                    d.get('ask_2_price'),
-                    d.get('ask_2_volume'),
-                    d.get('ask_3_price'),
-                    d.get('ask_3_volume'),
-                    d.get('updated_at', datetime.now().isoformat()),
-                )
+                (*map(d.get, _PRICE_BOARD_COLUMNS[:-1]), d.get('updated_at', now))
                 for d in data
             ]
-            await db.executemany(query, params)
-            await db.commit()
+            async with _write_transaction(db):
+                await _upsert_multi_row(db, 'price_board', _PRICE_BOARD_COLUMNS, ('symbol',), params)
             
             logger.info(f"📥 Upserted {len(data)} price board records")
             return len(data)
@@ -1541,10 +2220,11 @@ class Database:
         self,
         symbols: Optional[List[str]] = None,
         exchange: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
     ) -> List[Dict[str, Any]]:
-        """Get price board data."""
-        query = "SELECT * FROM price_board WHERE 1=1"
+        """Get price board data (optionally only some columns)."""
+        query = f"SELECT {_column_list(columns, _PRICE_BOARD_COLUMNS)} FROM price_board WHERE 1=1"
         params = []
         
         if symbols:
@@ -1559,10 +2239,10 @@ class Database:
         query += " ORDER BY accumulated_value DESC NULLS LAST LIMIT ?"
         params.append(limit)
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, params)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            async with db.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
     
     # =========================================
     # Industry Flow Operations (from scrapers)
@@ -1574,55 +2254,71 @@ class Database:
             return 0
         
         # Use today's date for uniqueness
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        query = """
-            INSERT OR REPLACE INTO industry_flow 
-            (industry_name, industry_name_en, cashflow, rate_of_change,
-             rs_short, rs_mid, rs_relative, 
-             net_buy_volume, net_buy_value, sector_performance,
-             source, date_collected, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        now = datetime.now().isoformat()
+        today = now[:10]
+        
+        params = (
+            (
+                d.get('industry_name'),
+                d.get('industry_name_en'),
+                d.get('cashflow'),
+                d.get('rate_of_change'),
+                d.get('rs_short'),
+                d.get('rs_mid'),
+                d.get('rs_relative'),
+                d.get('net_buy_volume'),
+                d.get('net_buy_value'),
+                d.get('sector_performance'),
+                d.get('source', 'sieucophieu'),
+                today,
+                d.get('timestamp') or now,
+            )
+            for d in flow_data
+        )
+        async with self.writer() as db:
+            # A batch joining the caller's transaction() may still roll back
+            joined = db.in_transaction
+            # Scrapers re-submit the same day's figures; identical rows keep
+            # their first timestamp and cost no writes
+            changed = await self._write_batch(
+                _upsert_query(
+                    'industry_flow', _INDUSTRY_FLOW_COLUMNS, ('industry_name', 'date_collected'),
+                    changed=_INDUSTRY_FLOW_DATA_COLUMNS,
+                ),
+                params,
+            )
         
-        async with self.connection() as db:
-            params = [
-                (
-                    d.get('industry_name'),
-                    d.get('industry_name_en'),
-                    d.get('cashflow'),
-                    d.get('rate_of_change'),
-                    d.get('rs_short'),
-                    d.get('rs_mid'),
-                    d.get('rs_relative'),
-                    d.get('net_buy_volume'),
-                    d.get('net_buy_value'),
-                    d.get('sector_performance'),
-                    d.get('source', 'sieucophieu'),
-                    today,
-                    d.get('timestamp', datetime.now().isoformat()),
-                )
-                for d in flow_data
-            ]
-            await db.executemany(query, params)
-            await db.commit()
-            
-            logger.info(f"📥 Upserted {len(flow_data)} industry flow records")
-            return len(flow_data)
+        if not joined:
+            self._lookup_cache.set(('latest_flow_date',), today)
+        logger.info(
+            f"📥 Upserted {len(flow_data)} industry flow records ({len(flow_data) - changed} unchanged)"
+        )
+        return len(flow_data)
     
-    async def get_industry_flow(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get latest industry flow data."""
-        query = """
-            SELECT * FROM industry_flow
-            WHERE date_collected = (SELECT MAX(date_collected) FROM industry_flow)
+    async def get_industry_flow(
+        self, limit: int = 50, columns: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get latest industry flow data (optionally only some columns)."""
+        # idx_industry_flow_date_cashflow serves the day in cashflow order
+        query = f"""
+            SELECT {_column_list(columns, _INDUSTRY_FLOW_READ_COLUMNS)} FROM industry_flow
+            WHERE date_collected = ?
             ORDER BY cashflow DESC
             LIMIT ?
         """
         
-        async with self.connection() as db:
-            cursor = await db.execute(query, (limit,))
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as db:
+            latest = self._lookup_cache.get(('latest_flow_date',))
+            if latest is None:
+                async with db.execute("SELECT MAX(date_collected) FROM industry_flow") as cursor:
+                    latest = (await cursor.fetchone())[0]
+                if latest is None:
+                    return []
+                self._lookup_cache.set(('latest_flow_date',), latest)
+            
+            async with db.execute(query, (latest, limit)) as cursor:
+                rows = await cursor.fetchall()
+                return _rows_to_dicts(cursor, rows)
 
     # =========================================
     # Financial Data Operations (BCTC)
@@ -1636,9 +2332,12 @@ class Database:
         symbol = data.get('symbol')
         if not symbol:
             return 0
+        symbol = str(symbol)
         
-        # Merge data by period
-        merged_by_period = {}
+        # Merge data by period, one {period: value} map per source field;
+        # later statements overwrite earlier ones for the same period
+        values: Dict[str, Dict[str, Any]] = {source: {} for source in _FINANCIAL_SOURCES}
+        periods: Dict[str, None] = {}
         
         def merge_items(items: List[Dict[str, Any]]):
             if not items: return
@@ -1650,92 +2349,43 @@ class Database:
                 
                 # Use only year part if it's a date
                 period = raw_period.split('-')[0]
+                periods[period] = None
                 
-                if period not in merged_by_period:
-                    merged_by_period[period] = {'symbol': symbol, 'period': period}
-                
-                # Merge fields (skip identifiers)
-                for k, v in item.items():
-                    if k not in ['symbol', 'period', 'period_type']:
-                        merged_by_period[period][k] = v
+                for k in _FINANCIAL_SOURCES.intersection(item):
+                    values[k][period] = item[k]
 
         merge_items(data.get('income_statement', []))
         merge_items(data.get('balance_sheet', []))
         merge_items(data.get('ratios', []))
         
-        if not merged_by_period:
+        if not periods:
             return 0
 
         # Upsert into database
-        rows = list(merged_by_period.values())
-        
-        query = """
-            INSERT OR REPLACE INTO financial_metrics (
-                symbol, period,
-                revenue, gross_profit, operating_profit, net_profit,
-                total_assets, total_liabilities, total_equity, 
-                current_assets, current_liabilities, cash_and_equivalents,
-                pe_ratio, pb_ratio, roe, roa,
-                gross_margin, net_margin, debt_to_equity,
-                earnings_per_share, book_value_per_share,
-                updated_at
-            ) VALUES (
-                ?, ?,
-                ?, ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?,
-                ?, ?, ?, ?,
-                ?, ?, ?,
-                ?, ?,
-                ?
-            )
-        """
-        
-        params = []
         now = datetime.now().isoformat()
-        
-        for r in rows:
-            # Helper to get float safely
-            def get_val(key):
-                val = r.get(key)
-                if val is None or val == '': return None
-                try: return float(val)
-                except: return None
-            
-            params.append((
-                r.get('symbol'),
-                r.get('period'),
-                get_val('revenue'),
-                get_val('gross_profit'),
-                get_val('operating_profit'),
-                get_val('net_profit'),
-                get_val('total_assets'),
-                get_val('total_liabilities'),
-                get_val('total_equity'),
-                get_val('current_assets'),
-                get_val('current_liabilities'),
-                get_val('cash_and_equivalents'),
-                get_val('priceToEarning'),      
-                get_val('priceToBook'),         
-                get_val('roe'),
-                get_val('roa'),
-                get_val('grossMargin'),
-                get_val('netMargin'),
-                get_val('debtToEquity'),
-                get_val('eps'),
-                get_val('bookValuePerShare'),
-                now
-            ))
+        # Column order of _FINANCIAL_COLUMNS
+        field_values = [values[source] for source, _ in _FINANCIAL_FIELDS]
+        params = (
+            (symbol, period, *map(_to_float, [v.get(period) for v in field_values]), now)
+            for period in periods
+        )
 
-        async with self.connection() as db:
-            await db.executemany(query, params)
-            await db.commit()
+        await self._write_batch(
+            _upsert_query('financial_metrics', _FINANCIAL_COLUMNS, ('symbol', 'period')), params
+        )
             
-        return len(rows)
+        return len(periods)
+
+
+# Keyword arguments get_stocks_with_screener_data_raw accepts
+_SCREENER_ARGUMENTS = frozenset(
+    inspect.signature(Database.iter_stocks_with_screener_data).parameters
+) - {'self'}
 
 
 # Global database instance
 _db: Optional[Database] = None
+_db_lock = asyncio.Lock()
 
 
 async def get_database(db_path: Optional[str] = None) -> Database:
@@ -1743,7 +2393,12 @@ async def get_database(db_path: Optional[str] = None) -> Database:
     global _db
     
     if _db is None:
-        _db = Database(db_path)
-        await _db.initialize()
+        # Concurrent first callers wait for one initialize() instead of
+        # building their own instance or seeing one mid-initialization
+        async with _db_lock:
+            if _db is None:
+                db = Database(db_path)
+                await db.initialize()
+                _db = db
     
     return _db
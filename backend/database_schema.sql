@@ -14,12 +14,43 @@ CREATE TABLE IF NOT EXISTS stocks (
     listing_date TEXT,
     shares_outstanding INTEGER,
     is_active INTEGER DEFAULT 1,
+    -- Maintained by triggers, see "Effective Market Cap / Price" below
+    effective_market_cap REAL,
+    effective_price REAL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE INDEX IF NOT EXISTS idx_stocks_exchange ON stocks(exchange);
 CREATE INDEX IF NOT EXISTS idx_stocks_sector ON stocks(sector);
+-- Screener / listing queries always filter on is_active first
+CREATE INDEX IF NOT EXISTS idx_stocks_active_exchange_sector ON stocks(is_active, exchange, sector);
+
+-- Full-text index over symbol/company name for substring search.
+-- The trigram tokenizer matches anywhere in the text like LIKE '%x%'
+-- but via the index; queries shorter than 3 characters fall back to LIKE.
+CREATE VIRTUAL TABLE IF NOT EXISTS stocks_fts USING fts5(
+    symbol, company_name,
+    content='stocks', content_rowid='rowid',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS stocks_fts_insert AFTER INSERT ON stocks BEGIN
+    INSERT INTO stocks_fts(rowid, symbol, company_name)
+    VALUES (new.rowid, new.symbol, new.company_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_fts_delete AFTER DELETE ON stocks BEGIN
+    INSERT INTO stocks_fts(stocks_fts, rowid, symbol, company_name)
+    VALUES ('delete', old.rowid, old.symbol, old.company_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_fts_update AFTER UPDATE OF symbol, company_name ON stocks BEGIN
+    INSERT INTO stocks_fts(stocks_fts, rowid, symbol, company_name)
+    VALUES ('delete', old.rowid, old.symbol, old.company_name);
+    INSERT INTO stocks_fts(rowid, symbol, company_name)
+    VALUES (new.rowid, new.symbol, new.company_name);
+END;
 
 -- ============================================
 -- Stock Prices (Current/Latest)
@@ -61,7 +92,11 @@ CREATE TABLE IF NOT EXISTS stock_prices (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_stock_prices_pe ON stock_prices(pe_ratio);
+-- P/E range filters in get_stocks, ordered by market cap; replaces the
+-- single-column index and skips rows without a P/E
+DROP INDEX IF EXISTS idx_stock_prices_pe;
+CREATE INDEX IF NOT EXISTS idx_stock_prices_pe_market_cap ON stock_prices(pe_ratio, market_cap DESC)
+    WHERE pe_ratio IS NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_stock_prices_pb ON stock_prices(pb_ratio);
 CREATE INDEX IF NOT EXISTS idx_stock_prices_roe ON stock_prices(roe);
 CREATE INDEX IF NOT EXISTS idx_stock_prices_market_cap ON stock_prices(market_cap);
@@ -84,9 +119,12 @@ CREATE TABLE IF NOT EXISTS price_history (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_price_history_symbol ON price_history(symbol);
+-- Indexes on just the leading column of a UNIQUE key (here and on the
+-- tables below) are dropped: lookups by that prefix use the UNIQUE index,
+-- and a separate index only added write cost.
+DROP INDEX IF EXISTS idx_price_history_symbol;
 CREATE INDEX IF NOT EXISTS idx_price_history_date ON price_history(date);
-CREATE INDEX IF NOT EXISTS idx_price_history_symbol_date ON price_history(symbol, date);
+DROP INDEX IF EXISTS idx_price_history_symbol_date;
 
 -- ============================================
 -- Financial Metrics (Detailed)
@@ -139,7 +177,7 @@ CREATE TABLE IF NOT EXISTS financial_metrics (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_financial_metrics_symbol ON financial_metrics(symbol);
+DROP INDEX IF EXISTS idx_financial_metrics_symbol;
 CREATE INDEX IF NOT EXISTS idx_financial_metrics_period ON financial_metrics(period);
 
 -- ============================================
@@ -211,7 +249,7 @@ CREATE TABLE IF NOT EXISTS data_update_tracker (
     UNIQUE(symbol, data_type)
 );
 
-CREATE INDEX IF NOT EXISTS idx_update_tracker_symbol ON data_update_tracker(symbol);
+DROP INDEX IF EXISTS idx_update_tracker_symbol;
 CREATE INDEX IF NOT EXISTS idx_update_tracker_type ON data_update_tracker(data_type);
 CREATE INDEX IF NOT EXISTS idx_update_tracker_next_due ON data_update_tracker(next_update_due);
 CREATE INDEX IF NOT EXISTS idx_update_tracker_status ON data_update_tracker(last_status);
@@ -235,7 +273,7 @@ CREATE TABLE IF NOT EXISTS dividend_history (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_dividend_symbol ON dividend_history(symbol);
+DROP INDEX IF EXISTS idx_dividend_symbol;
 CREATE INDEX IF NOT EXISTS idx_dividend_ex_date ON dividend_history(ex_date);
 
 -- ============================================
@@ -255,7 +293,7 @@ CREATE TABLE IF NOT EXISTS company_ratings (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_ratings_symbol ON company_ratings(symbol);
+DROP INDEX IF EXISTS idx_ratings_symbol;
 CREATE INDEX IF NOT EXISTS idx_ratings_type ON company_ratings(rating_type);
 
 -- ============================================
@@ -275,9 +313,9 @@ CREATE TABLE IF NOT EXISTS intraday_prices (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_intraday_symbol ON intraday_prices(symbol);
+DROP INDEX IF EXISTS idx_intraday_symbol;
 CREATE INDEX IF NOT EXISTS idx_intraday_timestamp ON intraday_prices(timestamp);
-CREATE INDEX IF NOT EXISTS idx_intraday_symbol_time ON intraday_prices(symbol, timestamp);
+DROP INDEX IF EXISTS idx_intraday_symbol_time;
 
 -- ============================================
 -- Market Indices
@@ -298,7 +336,7 @@ CREATE TABLE IF NOT EXISTS market_indices (
     UNIQUE(index_code, timestamp)
 );
 
-CREATE INDEX IF NOT EXISTS idx_indices_code ON market_indices(index_code);
+DROP INDEX IF EXISTS idx_indices_code;
 CREATE INDEX IF NOT EXISTS idx_indices_timestamp ON market_indices(timestamp);
 
 -- ============================================
@@ -334,6 +372,12 @@ CREATE TABLE IF NOT EXISTS stock_metrics (
     price_return_3m REAL,       -- 3 month return (%)
     price_fluctuation REAL,     -- 30-day volatility (%)
     
+    -- Relative Strength (added by migrate_schema.py on older databases)
+    rel_strength_1m REAL,
+    rel_strength_3m REAL,
+    rel_strength_1y REAL,
+    relative_strength_3d REAL,
+    
     -- Trend
     stock_trend TEXT,           -- 'strong_uptrend', 'uptrend', 'sideways', 'downtrend', 'strong_downtrend'
     
@@ -348,7 +392,9 @@ CREATE TABLE IF NOT EXISTS stock_metrics (
 );
 
 CREATE INDEX IF NOT EXISTS idx_metrics_rsi ON stock_metrics(rsi_14);
-CREATE INDEX IF NOT EXISTS idx_metrics_trend ON stock_metrics(stock_trend);
+-- Trend filter, usually combined with an RSI band; replaces the trend-only index
+DROP INDEX IF EXISTS idx_metrics_trend;
+CREATE INDEX IF NOT EXISTS idx_metrics_trend_rsi ON stock_metrics(stock_trend, rsi_14);
 CREATE INDEX IF NOT EXISTS idx_metrics_adx ON stock_metrics(adx);
 
 -- ============================================
@@ -464,6 +510,12 @@ CREATE INDEX IF NOT EXISTS idx_screener_roe ON screener_metrics(roe);
 CREATE INDEX IF NOT EXISTS idx_screener_market_cap ON screener_metrics(market_cap);
 CREATE INDEX IF NOT EXISTS idx_screener_rsi ON screener_metrics(rsi14);
 CREATE INDEX IF NOT EXISTS idx_screener_rating ON screener_metrics(stock_rating);
+-- Top-N by market cap without walking the NULL (unlisted/no data) rows
+CREATE INDEX IF NOT EXISTS idx_screener_market_cap_nn ON screener_metrics(market_cap DESC)
+    WHERE market_cap IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_screener_pe_roe ON screener_metrics(pe_ratio, roe);
+CREATE INDEX IF NOT EXISTS idx_screener_rel_strength ON screener_metrics(rel_strength_3m);
+CREATE INDEX IF NOT EXISTS idx_screener_price_change ON screener_metrics(prev_1d_growth_pct);
 
 -- ============================================
 -- Company Shareholders
@@ -481,7 +533,7 @@ CREATE TABLE IF NOT EXISTS shareholders (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_shareholders_symbol ON shareholders(symbol);
+DROP INDEX IF EXISTS idx_shareholders_symbol;
 CREATE INDEX IF NOT EXISTS idx_shareholders_ownership ON shareholders(ownership_percent);
 
 -- ============================================
@@ -503,7 +555,7 @@ CREATE TABLE IF NOT EXISTS officers (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_officers_symbol ON officers(symbol);
+DROP INDEX IF EXISTS idx_officers_symbol;
 CREATE INDEX IF NOT EXISTS idx_officers_status ON officers(status);
 
 -- ============================================
@@ -552,7 +604,76 @@ CREATE TABLE IF NOT EXISTS price_board (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_price_board_exchange ON price_board(exchange);
+-- Price board listings are ordered by traded value; the exchange index
+-- carries it too so a per-exchange board is read in order without a sort
+DROP INDEX IF EXISTS idx_price_board_exchange;
+CREATE INDEX IF NOT EXISTS idx_price_board_exchange_value ON price_board(exchange, accumulated_value DESC);
+CREATE INDEX IF NOT EXISTS idx_price_board_value ON price_board(accumulated_value DESC);
+
+-- ============================================
+-- Effective Market Cap / Price on stocks
+-- ============================================
+-- stocks.effective_market_cap / effective_price hold the screener value
+-- falling back to stock_prices, i.e. COALESCE(sm.x, sp.x). Keeping them on
+-- stocks lets the screener sort and range-filter through an index instead
+-- of computing the COALESCE over the whole join.
+CREATE INDEX IF NOT EXISTS idx_stocks_active_market_cap ON stocks(is_active, effective_market_cap);
+CREATE INDEX IF NOT EXISTS idx_stocks_active_price ON stocks(is_active, effective_price);
+
+-- The precedence rule lives only in this view; the triggers below and the
+-- backfill for older databases copy its values onto stocks
+CREATE VIEW IF NOT EXISTS v_stocks_effective AS
+SELECT
+    s.symbol,
+    COALESCE(
+        (SELECT market_cap FROM screener_metrics WHERE symbol = s.symbol),
+        (SELECT market_cap FROM stock_prices WHERE symbol = s.symbol)) AS market_cap,
+    COALESCE(
+        (SELECT price_near_realtime FROM screener_metrics WHERE symbol = s.symbol),
+        (SELECT current_price FROM stock_prices WHERE symbol = s.symbol)) AS price
+FROM stocks s;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_stock_insert AFTER INSERT ON stocks BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = new.symbol)
+    WHERE symbol = new.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_price_insert AFTER INSERT ON stock_prices BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = new.symbol)
+    WHERE symbol = new.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_price_update AFTER UPDATE OF market_cap, current_price ON stock_prices BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = new.symbol)
+    WHERE symbol = new.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_price_delete AFTER DELETE ON stock_prices BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = old.symbol)
+    WHERE symbol = old.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_screener_insert AFTER INSERT ON screener_metrics BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = new.symbol)
+    WHERE symbol = new.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_screener_update AFTER UPDATE OF market_cap, price_near_realtime ON screener_metrics BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = new.symbol)
+    WHERE symbol = new.symbol;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stocks_effective_on_screener_delete AFTER DELETE ON screener_metrics BEGIN
+    UPDATE stocks SET (effective_market_cap, effective_price) = (
+        SELECT market_cap, price FROM v_stocks_effective WHERE symbol = old.symbol)
+    WHERE symbol = old.symbol;
+END;
 
 -- ============================================
 -- Views for Common Queries
@@ -651,10 +772,12 @@ CREATE TABLE IF NOT EXISTS industry_flow (
     UNIQUE(industry_name, date_collected)
 );
 
-CREATE INDEX IF NOT EXISTS idx_industry_flow_name ON industry_flow(industry_name);
+DROP INDEX IF EXISTS idx_industry_flow_name;
 CREATE INDEX IF NOT EXISTS idx_industry_flow_timestamp ON industry_flow(timestamp);
 CREATE INDEX IF NOT EXISTS idx_industry_flow_cashflow ON industry_flow(cashflow);
-CREATE INDEX IF NOT EXISTS idx_industry_flow_date ON industry_flow(date_collected);
+-- Latest-day listing ordered by cashflow; replaces the date-only index
+DROP INDEX IF EXISTS idx_industry_flow_date;
+CREATE INDEX IF NOT EXISTS idx_industry_flow_date_cashflow ON industry_flow(date_collected, cashflow DESC);
 
 
 -- ============================================
@@ -705,7 +828,7 @@ CREATE TABLE IF NOT EXISTS daily_orderflow (
     FOREIGN KEY (symbol) REFERENCES stocks(symbol)
 );
 
-CREATE INDEX IF NOT EXISTS idx_daily_orderflow_symbol ON daily_orderflow(symbol);
+DROP INDEX IF EXISTS idx_daily_orderflow_symbol;
 CREATE INDEX IF NOT EXISTS idx_daily_orderflow_date ON daily_orderflow(trade_date);
-CREATE INDEX IF NOT EXISTS idx_daily_orderflow_symbol_date ON daily_orderflow(symbol, trade_date);
+DROP INDEX IF EXISTS idx_daily_orderflow_symbol_date;
 CREATE INDEX IF NOT EXISTS idx_daily_orderflow_foreign ON daily_orderflow(foreign_net_volume);
@@ -1,13 +1,13 @@
 """Debug script to inspect cophieu68 HTML structure."""
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 async def debug():
     async with aiohttp.ClientSession() as session:
         async with session.get('https://www.cophieu68.vn/market/markets.php?vt=1&cP=1') as resp:
             html = await resp.text()
-            soup = BeautifulSoup(html, 'html.parser')
+            soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('table'))
             
             # Find data table
             tables = soup.find_all('table')
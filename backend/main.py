@@ -13,7 +13,7 @@ from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 from loguru import logger
 
@@ -110,6 +110,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("👋 VnStock Screener API shutting down...")
+    await db.shutdown()
 
 
 # ============================================
@@ -196,7 +197,7 @@ class HealthResponse(BaseModel):
 # Stock Endpoints
 # ============================================
 
-@app.get("/api/stocks", response_model=StockListResponse)
+@app.get("/api/stocks", response_model=StockListResponse, response_class=ORJSONResponse)
 async def get_stocks(
     exchange: Optional[str] = Query(None, description="Filter by exchange (HOSE, HNX, UPCOM)"),
     sector: Optional[str] = Query(None, description="Filter by sector"),
@@ -209,11 +210,13 @@ async def get_stocks(
     search: Optional[str] = Query(None, description="Search by symbol or name"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=500, description="Items per page"),
+    after_symbol: Optional[str] = Query(None, description="Continue after this symbol (keyset paging; page is ignored)"),
+    after_market_cap: Optional[float] = Query(None, description="Market cap of the after_symbol row"),
 ):
     """Get stocks with optional filters."""
     db = await get_database()
     
-    offset = (page - 1) * page_size
+    offset = 0 if after_symbol else (page - 1) * page_size
     
     stocks = await db.get_stocks(
         exchange=exchange,
@@ -227,6 +230,8 @@ async def get_stocks(
         search=search,
         limit=page_size,
         offset=offset,
+        after_symbol=after_symbol,
+        after_market_cap=after_market_cap,
     )
     
     total = await db.get_stock_count(exchange=exchange)
@@ -240,7 +245,7 @@ async def get_stocks(
 
 
 # Note: Static routes must come BEFORE {symbol} routes
-@app.get("/api/stocks/screener")
+@app.get("/api/stocks/screener", response_class=ORJSONResponse)
 async def screen_stocks(
     # === Basic Filters ===
     exchange: Optional[str] = Query(None, description="Filter by exchange (HOSE, HNX, UPCOM)"),
@@ -289,6 +294,7 @@ async def screen_stocks(
     page_size: int = Query(50, ge=1, le=2000, description="Items per page"),
     sort_by: Optional[str] = Query('market_cap', description="Sort by field"),
     order: Optional[str] = Query('desc', description="Sort order (asc/desc)"),
+    columnar: bool = Query(False, description="Return columns + rows arrays instead of one object per stock"),
 ):
     """
     Advanced stock screener with comprehensive filters.
@@ -299,13 +305,15 @@ async def screen_stocks(
     - Financial (Tài Chính): P/E, P/B, ROE, Margins, Growth
     
     Stock trend options: 'uptrend', 'breakout', 'heating_up'
+    
+    With columnar=true the page is returned as "columns" and "rows"
+    (one array per stock) instead of "stocks".
     """
     db = await get_database()
     
     offset = (page - 1) * page_size
     
-    # Get stocks with comprehensive screener data
-    stocks = await db.get_stocks_with_screener_data(
+    filters = dict(
         # Basic
         exchange=exchange,
         sector=sector,
@@ -351,23 +359,31 @@ async def screen_stocks(
         offset=offset,
     )
     
-    # Get total count for pagination
-    total = await db.count_stocks_with_screener_data(
-        exchange=exchange,
-        sector=sector,
-        search=search,
-        pe_min=pe_min,
-        pe_max=pe_max,
-        pb_min=pb_min,
-        pb_max=pb_max,
-        roe_min=roe_min,
-        rsi_min=rsi_min,
-        rsi_max=rsi_max,
-        market_cap_min=market_cap_min,
-    )
+    # Get stocks with comprehensive screener data
+    if columnar:
+        raw = await db.get_stocks_with_screener_data_raw(**filters)
+        payload = {"columns": raw['columns'], "rows": raw['rows']}
+        total = raw['total']
+    else:
+        stocks = await db.get_stocks_with_screener_data(**filters)
+        payload = {"stocks": stocks}
+        # Each row carries the unpaged total
+        total = stocks[0]['total_count'] if stocks else None
+        for stock in stocks:
+            del stock['total_count']
+    
+    # Only an empty page past the first needs a separate count
+    if total is None:
+        if offset == 0:
+            total = 0
+        else:
+            total = await db.count_stocks_with_screener_data(**{
+                name: value for name, value in filters.items()
+                if name not in ('sort_by', 'order', 'limit', 'offset')
+            })
     
-    return {
-        "stocks": stocks,
+    response = {
+        **payload,
         "total": total,
         "page": page,
         "page_size": page_size,
@@ -395,6 +411,8 @@ async def screen_stocks(
             },
         }
     }
+    # Rows are plain SQLite values, so skip the jsonable_encoder walk
+    return ORJSONResponse(response)
 
 
 # Routes with {symbol} path parameter must come AFTER static routes
@@ -474,32 +492,13 @@ async def get_smart_board_highlights():
     """Get highlight lists (Top Gainers, Top Volume)."""
     db = await get_database()
     
-    # Get top gainers
-    async with db.connection() as conn:
-        cursor = await conn.execute("""
-            SELECT s.symbol, s.company_name, sp.current_price, sp.price_change, sp.percent_change, sp.volume
-            FROM stocks s
-            JOIN stock_prices sp ON s.symbol = sp.symbol
-            WHERE sp.percent_change > 0 AND sp.volume > 100000
-            ORDER BY sp.percent_change DESC
-            LIMIT 10
-        """)
-        gainers = [dict(row) for row in await cursor.fetchall()]
-        
-        # Get top volume
-        cursor = await conn.execute("""
-            SELECT s.symbol, s.company_name, sp.current_price, sp.price_change, sp.percent_change, sp.volume
-            FROM stocks s
-            JOIN stock_prices sp ON s.symbol = sp.symbol
-            WHERE sp.volume > 0
-            ORDER BY sp.volume DESC
-            LIMIT 10
-        """)
-        active = [dict(row) for row in await cursor.fetchall()]
-        
-        # Get new highs (mock logic using price vs 52w if available, or just strong uptrend)
-        # Using simple gainers for now as "Vượt đỉnh" needs history analysis
-        
+    highlights = await db.get_price_highlights(limit=10)
+    gainers = highlights['gainers']
+    active = highlights['active']
+    
+    # Get new highs (mock logic using price vs 52w if available, or just strong uptrend)
+    # Using simple gainers for now as "Vượt đỉnh" needs history analysis
+    
     return {
         "highlights": [
             {"id": "top-gainers", "name": "Tăng giá mạnh", "stocks": gainers},
@@ -970,17 +969,7 @@ async def get_orderflow_history(
     """
     db = await get_database()
     
-    query = """
-        SELECT * FROM daily_orderflow
-        WHERE symbol = ?
-        ORDER BY trade_date DESC
-        LIMIT ?
-    """
-    
-    async with db.connection() as conn:
-        cursor = await conn.execute(query, (symbol.upper(), days))
-        rows = await cursor.fetchall()
-        data = [dict(row) for row in rows]
+    data = await db.get_daily_orderflow(symbol.upper(), days)
     
     return {
         "symbol": symbol.upper(),
@@ -42,7 +42,9 @@ class MarketIndicesCollector:
         # We might need `stock_historical_data` or a specific index endpoint.
         
         # Let's try direct index history for today to get "current" value
-        today = datetime.now().strftime('%Y-%m-%d')
+        now = datetime.now()
+        today = now.strftime('%Y-%m-%d')
+        now_iso = now.isoformat()
         
         for index_code in indices:
             try:
@@ -68,7 +70,7 @@ class MarketIndicesCollector:
                     
                     data = {
                         'index_code': index_code,
-                        'timestamp': str(latest.get('time', datetime.now().isoformat())),
+                        'timestamp': str(latest.get('time', now_iso)),
                         'value': float(latest.get('close', 0)),
                         'change_value': float(latest.get('close', 0)) - float(latest.get('open', 0)), # Approx if no explicit change
                         'change_percent': 0.0, # Calculate below
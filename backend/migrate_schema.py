@@ -7,6 +7,8 @@ Run this when database schema has been updated.
 import sqlite3
 from pathlib import Path
 
+from database import _BACKFILL_EFFECTIVE_COLUMNS
+
 
 def get_existing_columns(cursor, table_name: str) -> set:
     """Get set of existing column names for a table."""
@@ -82,6 +84,32 @@ def migrate_stock_metrics(cursor):
     return added
 
 
+def migrate_stocks(cursor):
+    """Add the trigger-maintained effective_* columns to stocks."""
+    print("\n📊 Migrating stocks table...")
+    
+    existing = get_existing_columns(cursor, 'stocks')
+    
+    columns_to_add = [
+        ('effective_market_cap', 'REAL'),
+        ('effective_price', 'REAL'),
+    ]
+    
+    added = 0
+    for col_name, col_type in columns_to_add:
+        if add_column_if_missing(cursor, 'stocks', col_name, col_type, existing):
+            added += 1
+    
+    print(f"  📈 Added {added} new columns to stocks")
+    return added
+
+
+def backfill_stocks(cursor):
+    """Fill effective_* for existing rows; triggers keep them current after."""
+    cursor.execute(_BACKFILL_EFFECTIVE_COLUMNS)
+    print(f"  ✅ Backfilled effective market cap/price for {cursor.rowcount} stocks")
+
+
 def migrate_database():
     """Run all migrations."""
     db_path = Path(__file__).parent / 'data' / 'vnstock_data.db'
@@ -106,6 +134,8 @@ def migrate_database():
         total_added = 0
         total_added += migrate_stock_prices(cursor)
         total_added += migrate_stock_metrics(cursor)
+        stocks_added = migrate_stocks(cursor)
+        total_added += stocks_added
         
         # Also run the full schema to create any missing tables
         schema_path = Path(__file__).parent / 'database_schema.sql'
@@ -116,6 +146,9 @@ def migrate_database():
             cursor.executescript(schema)
             print("  ✅ Schema applied")
         
+        if stocks_added:
+            backfill_stocks(cursor)
+        
         conn.commit()
         
         # Verify
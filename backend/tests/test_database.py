@@ -0,0 +1,675 @@
+"""
+Database Layer Tests
+
+Runs the Database manager against a throwaway SQLite file built from
+database_schema.sql. Verifies:
+- Upserts update rows in place instead of replacing them
+- Read helpers return the expected shapes
+"""
+
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+import pytest_asyncio
+
+import database as database_module
+from database import Database, get_database
+
+
+# ============= Fixtures =============
+
+@pytest_asyncio.fixture
+async def db(tmp_path):
+    """Fresh, initialized database per test."""
+    database = Database(str(tmp_path / "test.db"))
+    await database.initialize()
+    yield database
+    await database.close()
+
+
+async def seed_stocks(db: Database):
+    await db.upsert_stocks([
+        {'symbol': 'VNM', 'company_name': 'Vinamilk', 'exchange': 'HOSE', 'sector': 'Food'},
+        {'symbol': 'FPT', 'company_name': 'FPT Corp', 'exchange': 'HOSE', 'sector': 'Tech'},
+        {'symbol': 'SHS', 'company_name': 'SHS Securities', 'exchange': 'HNX', 'sector': 'Finance'},
+    ])
+    await db.upsert_stock_prices([
+        {'symbol': 'VNM', 'current_price': 70000, 'market_cap': 150000, 'pe_ratio': 15, 'roe': 25},
+        {'symbol': 'FPT', 'current_price': 120000, 'market_cap': 170000, 'pe_ratio': 20, 'roe': 28},
+        {'symbol': 'SHS', 'current_price': 15000, 'market_cap': 10000, 'pe_ratio': 8, 'roe': 12},
+    ])
+
+
+# ============= Upsert Tests =============
+
+@pytest.mark.asyncio
+async def test_upsert_stocks_updates_in_place(db):
+    """Re-upserting a stock keeps its rowid and unlisted columns."""
+    await seed_stocks(db)
+
+    async with db.connection() as conn:
+        await conn.execute("UPDATE stocks SET is_active = 0 WHERE symbol = 'SHS'")
+        await conn.commit()
+        cursor = await conn.execute("SELECT rowid FROM stocks WHERE symbol = 'VNM'")
+        rowid_before = (await cursor.fetchone())[0]
+
+    await db.upsert_stocks([
+        {'symbol': 'VNM', 'company_name': 'Vinamilk JSC', 'exchange': 'HOSE'},
+        {'symbol': 'SHS', 'company_name': 'SHS Securities', 'exchange': 'HNX'},
+    ])
+
+    async with db.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT rowid, company_name FROM stocks WHERE symbol = 'VNM'"
+        )
+        row = await cursor.fetchone()
+        cursor = await conn.execute("SELECT is_active FROM stocks WHERE symbol = 'SHS'")
+        shs = await cursor.fetchone()
+
+    assert row['rowid'] == rowid_before
+    assert row['company_name'] == 'Vinamilk JSC'
+    assert shs['is_active'] == 0
+
+
+@pytest.mark.asyncio
+async def test_upsert_price_history_conflicts_on_symbol_date(db):
+    await seed_stocks(db)
+    await db.upsert_price_history([
+        {'symbol': 'VNM', 'date': '2024-01-02', 'close_price': 1.0},
+        {'symbol': 'VNM', 'date': '2024-01-03', 'close_price': 2.0},
+    ])
+    await db.upsert_price_history([
+        {'symbol': 'VNM', 'date': '2024-01-03', 'close_price': 3.0},
+    ])
+
+    history = await db.get_price_history('VNM')
+
+    assert [h['close_price'] for h in history] == [3.0, 1.0]
+
+
+@pytest.mark.asyncio
+async def test_bulk_price_history_goes_through_batch_writer(db, monkeypatch):
+    monkeypatch.setattr(database_module, '_BULK_LOAD_ROWS', 3)
+    await seed_stocks(db)
+    rows = [{'symbol': 'VNM', 'date': f'2024-01-0{day}', 'close_price': float(day)} for day in range(1, 5)]
+
+    assert await db.upsert_price_history(rows) == 4
+    # Joined into an open transaction, the bulk path commits with it
+    async with db.transaction():
+        await db.upsert_price_history([dict(row, close_price=0.0) for row in rows])
+
+    assert db._sync_writer is not None
+    history = await db.get_price_history('VNM')
+    assert [h['close_price'] for h in history] == [0.0] * 4
+
+
+@pytest.mark.asyncio
+async def test_upsert_stock_prices_defaults_and_aliases(db):
+    await seed_stocks(db)
+    await db.upsert_stock_prices([{'symbol': 'VNM', 'book_value': 12.5, 'current_price': 1}])
+
+    async with db.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT bvps, book_value, data_source, current_price FROM stock_prices WHERE symbol = 'VNM'"
+        )
+        row = await cursor.fetchone()
+
+    assert tuple(row) == (12.5, 12.5, 'vnstock', 1)
+
+
+@pytest.mark.asyncio
+async def test_upsert_shareholders_keeps_row_id(db):
+    await seed_stocks(db)
+    holder = {'symbol': 'VNM', 'shareholder_id': 'SCIC', 'shareholder_name': 'SCIC', 'ownership_percent': 36.0}
+    await db.upsert_shareholders([holder])
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT id FROM shareholders")
+        id_before = (await cursor.fetchone())[0]
+
+    await db.upsert_shareholders([{**holder, 'ownership_percent': 36.5}])
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT id FROM shareholders")
+        ids_after = [row[0] for row in await cursor.fetchall()]
+
+    assert ids_after == [id_before]
+    # The default selection is everything SELECT * returned
+    holders = await db.get_shareholders('VNM')
+    assert holders[0]['id'] == id_before
+    assert holders[0]['created_at'] is not None
+    assert await db.get_shareholders('VNM', columns=['shareholder_name', 'ownership_percent']) == [
+        {'shareholder_name': 'SCIC', 'ownership_percent': 36.5},
+    ]
+    with pytest.raises(ValueError):
+        await db.get_shareholders('VNM', columns=['id; DROP TABLE stocks'])
+
+
+@pytest.mark.asyncio
+async def test_upsert_price_board_spans_multiple_statements(db):
+    # ~1000 rows fit in one statement; include a duplicate key as well
+    board = [{'symbol': f'S{i:04d}', 'match_price': i} for i in range(2500)]
+    board.append({'symbol': 'S0001', 'match_price': -1})
+
+    await db.upsert_price_board(board)
+
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT COUNT(*), MIN(match_price) FROM price_board")
+        count, lowest = await cursor.fetchone()
+
+    assert count == 2500
+    assert lowest == -1
+
+
+@pytest.mark.asyncio
+async def test_failed_upsert_rolls_back_whole_batch(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        await db.upsert_officers([
+            {'symbol': 'VNM', 'officer_id': '1', 'status': 'working'},
+            {'symbol': None, 'officer_id': '2', 'status': 'working'},
+        ])
+
+    assert await db.get_officers('VNM') == []
+
+
+@pytest.mark.asyncio
+async def test_transaction_groups_upserts(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        async with db.transaction():
+            await db.upsert_stocks([{'symbol': 'VNM', 'company_name': 'Vinamilk'}])
+            await db.upsert_industry_flow([{'industry_name': None}])
+    assert await db.get_stock_count() == 0
+
+    async with db.transaction():
+        await db.upsert_stocks([{'symbol': 'VNM', 'company_name': 'Vinamilk'}])
+        await db.upsert_stock_prices([{'symbol': 'VNM', 'current_price': 70000}])
+        # Nothing is visible to readers until the block commits
+        assert await db.get_stock_count() == 0
+    assert await db.get_stock_count() == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_batch_writer_rolls_back_whole_batch(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        await db.upsert_industry_flow([{'industry_name': 'Ngân hàng'}, {'industry_name': None}])
+
+    assert await db.get_industry_flow() == []
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_flow_upsert_keeps_latest_day(db):
+    async with db.connection() as conn:
+        await conn.execute(
+            "INSERT INTO industry_flow (industry_name, date_collected) VALUES ('Thép', '2000-01-01')"
+        )
+        await conn.commit()
+
+    with pytest.raises(RuntimeError):
+        async with db.transaction():
+            await db.upsert_industry_flow([{'industry_name': 'Ngân hàng', 'cashflow': 1.0}])
+            raise RuntimeError("abort")
+
+    assert [f['industry_name'] for f in await db.get_industry_flow()] == ['Thép']
+
+
+@pytest.mark.asyncio
+async def test_upsert_financial_data_merges_statements_by_year(db):
+    await seed_stocks(db)
+
+    count = await db.upsert_financial_data({
+        'symbol': 'VNM',
+        'income_statement': [{'period': '2023-12-31', 'revenue': '60000', 'net_profit': 'n/a'}],
+        'balance_sheet': [{'period': '2023', 'total_assets': 50000}, {'period': 'nan'}],
+        'ratios': [{'period': 2023, 'priceToEarning': 14.5, 'roe': ''}],
+    })
+
+    async with db.connection() as conn:
+        cursor = await conn.execute(
+            "SELECT period, revenue, net_profit, total_assets, pe_ratio, roe FROM financial_metrics"
+        )
+        rows = [tuple(row) for row in await cursor.fetchall()]
+
+    assert count == 1
+    assert rows == [('2023', 60000.0, None, 50000.0, 14.5, None)]
+
+    # A re-fetch updates the row in place
+    await db.upsert_financial_data({'symbol': 'VNM', 'income_statement': [{'period': '2023', 'revenue': 61000}]})
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT id, revenue FROM financial_metrics")
+        assert [tuple(row) for row in await cursor.fetchall()] == [(1, 61000.0)]
+
+
+# ============= Query Tests =============
+
+@pytest.mark.asyncio
+async def test_get_stocks_filters_and_orders(db):
+    await seed_stocks(db)
+
+    stocks = await db.get_stocks(exchange='HOSE')
+
+    assert [s['symbol'] for s in stocks] == ['FPT', 'VNM']
+    assert [s async for s in db.iter_stocks(exchange='HOSE')] == stocks
+    assert await db.get_stock_count() == 3
+    assert sorted(await db.get_stock_symbols(exchange='HNX')) == ['SHS']
+
+
+@pytest.mark.asyncio
+async def test_get_stocks_keyset_pages(db):
+    await seed_stocks(db)
+    await db.upsert_stocks([{'symbol': 'ABC', 'company_name': 'No Price', 'exchange': 'HOSE'}])
+    await db.upsert_stocks([{'symbol': 'XYZ', 'company_name': 'No Price', 'exchange': 'HOSE'}])
+
+    pages, after = [], {}
+    while True:
+        page = await db.get_stocks(limit=2, **after)
+        if not page:
+            break
+        pages.append([s['symbol'] for s in page])
+        after = {'after_symbol': page[-1]['symbol'], 'after_market_cap': page[-1]['market_cap']}
+
+    assert pages == [['FPT', 'VNM'], ['SHS', 'ABC'], ['XYZ']]
+
+
+@pytest.mark.asyncio
+async def test_price_highlights_and_symbol_screener_row(db):
+    await seed_stocks(db)
+    await db.upsert_stock_prices([
+        {'symbol': 'VNM', 'percent_change': 2.0, 'volume': 500000},
+        {'symbol': 'FPT', 'percent_change': -1.0, 'volume': 900000},
+    ])
+    await db.upsert_screener_metrics([{'symbol': 'VNM', 'market_cap': 10}])
+
+    highlights = await db.get_price_highlights(limit=5)
+
+    assert [s['symbol'] for s in highlights['gainers']] == ['VNM']
+    assert [s['symbol'] for s in highlights['active']] == ['FPT', 'VNM']
+    assert (await db.get_symbol_screener_metrics('VNM'))['market_cap'] == 10
+    assert await db.get_symbol_screener_metrics('FPT') is None
+
+
+@pytest.mark.asyncio
+async def test_get_stocks_search(db):
+    await seed_stocks(db)
+    await db.upsert_stocks([{'symbol': 'VNM', 'company_name': 'Vinamilk JSC', 'exchange': 'HOSE'}])
+
+    # Long terms go through the trigram index, short ones through LIKE
+    assert [s['symbol'] for s in await db.get_stocks(search='milk j')] == ['VNM']
+    assert [s['symbol'] for s in await db.get_stocks(search='corp')] == ['FPT']
+    assert [s['symbol'] for s in await db.get_stocks(search='sh')] == ['SHS']
+    assert await db.get_stocks(search='"Vina') == []
+
+
+@pytest.mark.asyncio
+async def test_screener_data_filters_and_count(db):
+    await seed_stocks(db)
+    await db.upsert_screener_metrics([
+        {'symbol': 'VNM', 'industry': 'Food & Beverage', 'pe_ratio': 12, 'market_cap': 150000, 'uptrend': 1},
+        {'symbol': 'FPT', 'industry': 'Technology', 'pe_ratio': 22, 'market_cap': 170000, 'uptrend': 1},
+    ])
+
+    stocks = await db.get_stocks_with_screener_data(exchange='HOSE', pe_max=25, stock_trend='uptrend')
+    assert [s['symbol'] for s in stocks] == ['FPT', 'VNM']
+
+    # SHS has no screener row and falls back to its stock_prices P/E
+    stocks = await db.get_stocks_with_screener_data(pe_max=15, sort_by='pe', order='asc')
+    assert [s['symbol'] for s in stocks] == ['SHS', 'VNM']
+
+    stocks = await db.get_stocks_with_screener_data(sort_by='pe; DROP TABLE stocks', order='ASC', limit=1, offset=1)
+    assert [s['symbol'] for s in stocks] == ['VNM']
+    # The page carries the total before LIMIT/OFFSET
+    assert stocks[0]['total_count'] == 3
+
+    stocks = await db.get_stocks_with_screener_data(industry='tech', limit=1, offset=0)
+    assert [s['symbol'] for s in stocks] == ['FPT']
+
+    # Screener-only filters are bound ahead of the outer ones
+    stocks = await db.get_stocks_with_screener_data(exchange='HOSE', industry='o', pe_min=20)
+    assert [s['symbol'] for s in stocks] == ['FPT']
+
+    assert await db.count_stocks_with_screener_data(pe_max=15) == 2
+    assert await db.count_stocks_with_screener_data(search='vinamilk') == 1
+    assert await db.count_stocks_with_screener_data(search='f') == 1
+    assert await db.count_stocks_with_screener_data(exchange='') == 3
+    # The count takes every filter the page query does
+    assert await db.count_stocks_with_screener_data(exchange='HOSE', industry='o', pe_min=20) == 1
+    assert await db.count_stocks_with_screener_data(stock_trend='breakout') == 0
+
+
+@pytest.mark.asyncio
+async def test_screener_metrics_upsert_spans_statements(db):
+    # More rows than fit in one statement's variables
+    metrics = [{'symbol': f'S{i:04d}', 'pe_ratio': i} for i in range(1000)]
+    assert await db.upsert_screener_metrics(metrics) == 1000
+
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT COUNT(*), SUM(pe_ratio) FROM screener_metrics")
+        assert tuple(await cursor.fetchone()) == (1000, sum(range(1000)))
+
+
+@pytest.mark.asyncio
+async def test_screener_raw_page_matches_dict_rows(db):
+    await seed_stocks(db)
+
+    stocks = await db.get_stocks_with_screener_data(sort_by='pe', order='asc', limit=2)
+    raw = await db.get_stocks_with_screener_data_raw(sort_by='pe', order='asc', limit=2)
+
+    assert raw['total'] == 3
+    assert [dict(zip(raw['columns'], row)) for row in raw['rows']] == [
+        {k: v for k, v in stock.items() if k != 'total_count'} for stock in stocks
+    ]
+    assert (await db.get_stocks_with_screener_data_raw(offset=10))['total'] is None
+    with pytest.raises(TypeError):
+        await db.get_stocks_with_screener_data_raw(pe_mni=10)
+
+
+@pytest.mark.asyncio
+async def test_screener_metrics_puts_missing_market_cap_last(db):
+    await db.upsert_screener_metrics([
+        {'symbol': 'AAA', 'market_cap': None},
+        {'symbol': 'VNM', 'market_cap': 10},
+        {'symbol': 'FPT', 'market_cap': 20},
+    ])
+
+    assert [m['symbol'] for m in await db.get_screener_metrics()] == ['FPT', 'VNM', 'AAA']
+    assert [m['symbol'] for m in await db.get_screener_metrics(limit=2)] == ['FPT', 'VNM']
+
+
+@pytest.mark.asyncio
+async def test_effective_market_cap_follows_prices_and_screener(db):
+    await seed_stocks(db)
+    await db.upsert_screener_metrics([{'symbol': 'SHS', 'market_cap': 900000}])
+
+    stocks = await db.get_stocks_with_screener_data(market_cap_min=100000)
+    assert [(s['symbol'], s['market_cap']) for s in stocks] == [
+        ('SHS', 900000), ('FPT', 170000), ('VNM', 150000),
+    ]
+
+    await db.upsert_stock_prices([{'symbol': 'VNM', 'market_cap': 1}])
+    stocks = await db.get_stocks_with_screener_data(market_cap_min=100000)
+    assert [s['symbol'] for s in stocks] == ['SHS', 'FPT']
+
+
+@pytest.mark.asyncio
+async def test_initialize_backfills_effective_columns(db):
+    await seed_stocks(db)
+    await db.close()
+
+    # Roll the file back to a stocks table without the effective columns
+    conn = sqlite3.connect(db.db_path)
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE 'stocks_effective_%'"
+        " OR name IN ('idx_stocks_active_market_cap', 'idx_stocks_active_price')"
+    ).fetchall():
+        kind = 'TRIGGER' if name.startswith('stocks_') else 'INDEX'
+        conn.execute(f"DROP {kind} {name}")
+    conn.execute("ALTER TABLE stocks DROP COLUMN effective_market_cap")
+    conn.execute("ALTER TABLE stocks DROP COLUMN effective_price")
+    conn.commit()
+    conn.close()
+
+    database = Database(db.db_path)
+    await database.initialize()
+    stocks = await database.get_stocks_with_screener_data(market_cap_min=100000)
+    await database.close()
+
+    assert [(s['symbol'], s['current_price']) for s in stocks] == [('FPT', 120000), ('VNM', 70000)]
+
+
+@pytest.mark.asyncio
+async def test_screener_count_is_cached_until_screener_upsert(db):
+    await seed_stocks(db)
+    assert await db.count_stocks_with_screener_data(exchange='HOSE') == 2
+
+    async with db.connection() as conn:
+        await conn.execute("UPDATE stocks SET exchange = 'HOSE' WHERE symbol = 'SHS'")
+        await conn.commit()
+    assert await db.count_stocks_with_screener_data(exchange='HOSE') == 2
+    assert await db.count_stocks_with_screener_data(exchange='HNX') == 0
+
+    await db.upsert_screener_metrics([{'symbol': 'VNM'}])
+    assert await db.count_stocks_with_screener_data(exchange='HOSE') == 3
+
+
+@pytest.mark.asyncio
+async def test_screener_count_follows_price_upsert(db):
+    await seed_stocks(db)
+    assert await db.count_stocks_with_screener_data(pe_max=15) == 2
+
+    await db.upsert_stock_prices([{'symbol': 'FPT', 'current_price': 120000, 'pe_ratio': 10}])
+    assert await db.count_stocks_with_screener_data(pe_max=15) == 3
+    assert len(await db.get_stocks_with_screener_data(pe_max=15)) == 3
+
+
+# ============= Update Log Tests =============
+
+@pytest.mark.asyncio
+async def test_update_log_records_duration(db):
+    log_id = await db.log_update_start('prices')
+    await db.log_update_complete(log_id, 'completed', records_processed=5)
+
+    async with db.connection() as conn:
+        cursor = await conn.execute("SELECT * FROM update_logs WHERE id = ?", (log_id,))
+        row = await cursor.fetchone()
+
+    assert row['status'] == 'completed'
+    assert row['records_processed'] == 5
+    assert row['completed_at'] >= row['started_at']
+    assert 0 <= row['duration_seconds'] < 60
+
+
+# ============= Ratings Tests =============
+
+@pytest.mark.asyncio
+async def test_company_ratings_store_criteria_as_json(db):
+    await seed_stocks(db)
+    await db.upsert_company_ratings([
+        {'symbol': 'VNM', 'rating_type': 'general', 'rating_value': 4.2,
+         'criteria_scores': {'growth': 3.5, 1: 'x'}},
+        {'symbol': 'VNM', 'rating_type': 'valuation', 'criteria_scores': {}},
+    ])
+
+    ratings = await db.get_company_ratings('VNM')
+
+    assert ratings[0]['criteria_scores'] == '{"growth":3.5,"1":"x"}'
+    assert ratings[1]['criteria_scores'] is None
+
+
+# ============= Statistics Tests =============
+
+@pytest.mark.asyncio
+async def test_database_stats(db):
+    await seed_stocks(db)
+
+    stats = await db.get_database_stats()
+
+    assert stats['stocks_count'] == 3
+    assert stats['stock_prices_count'] == 3
+    assert stats['price_history_count'] == 0
+    assert stats['financial_metrics_count'] == 0
+    assert stats['last_price_update'] is not None
+    assert 'database_size_mb' in stats
+
+    # Cached until listings change
+    stats['stocks_count'] = -1
+    assert (await db.get_database_stats())['stocks_count'] == 3
+    await db.upsert_stocks([{'symbol': 'HPG', 'company_name': 'Hoa Phat', 'exchange': 'HOSE'}])
+    assert (await db.get_database_stats())['stocks_count'] == 4
+
+    await db.upsert_stock_prices([{'symbol': 'HPG', 'current_price': 25000}])
+    assert (await db.get_database_stats())['stock_prices_count'] == 4
+
+
+@pytest.mark.asyncio
+async def test_data_freshness_from_latest_price_update(db):
+    assert await db.get_data_freshness() == 'no_data'
+
+    await seed_stocks(db)
+    assert await db.get_data_freshness() == 'fresh'
+
+    async with db.connection() as conn:
+        await conn.execute("UPDATE stock_prices SET updated_at = '2020-01-01T00:00:00'")
+        await conn.commit()
+    assert await db.get_data_freshness() == 'outdated'
+
+
+# ============= Lookup Cache Tests =============
+
+@pytest.mark.asyncio
+async def test_lookup_cache_invalidated_by_upsert_stocks(db):
+    await seed_stocks(db)
+    assert await db.get_sectors() == ['Finance', 'Food', 'Tech']
+    assert await db.get_stock_count(exchange='HNX') == 1
+
+    # Direct writes are only seen once the cache is invalidated
+    async with db.connection() as conn:
+        await conn.execute("UPDATE stocks SET exchange = 'HNX' WHERE symbol = 'FPT'")
+        await conn.commit()
+    assert await db.get_stock_count(exchange='HNX') == 1
+
+    await db.upsert_stocks([{'symbol': 'MWG', 'exchange': 'HOSE', 'sector': 'Retail'}])
+
+    assert await db.get_stock_count(exchange='HNX') == 2
+    assert await db.get_sectors() == ['Finance', 'Food', 'Retail', 'Tech']
+
+
+# ============= Maintenance Tests =============
+
+@pytest.mark.asyncio
+async def test_database_uses_wal_and_shutdown_optimizes(db):
+    async with db.connection() as conn:
+        cursor = await conn.execute("PRAGMA journal_mode")
+        mode = (await cursor.fetchone())[0]
+        cursor = await conn.execute("PRAGMA wal_autocheckpoint")
+        autocheckpoint = (await cursor.fetchone())[0]
+        cursor = await conn.execute("PRAGMA page_size")
+        page_size = (await cursor.fetchone())[0]
+        cursor = await conn.execute("PRAGMA busy_timeout")
+        busy_timeout = (await cursor.fetchone())[0]
+
+    assert mode == 'wal'
+    assert autocheckpoint == 10000
+    assert page_size == 8192
+    assert busy_timeout == 5000
+    await db.shutdown()
+
+
+# ============= Connection Tests =============
+
+@pytest.mark.asyncio
+async def test_shared_writer_is_reentrant_and_discards_uncommitted(db):
+    await seed_stocks(db)
+
+    async with db.writer() as outer:
+        async with db.connection() as inner:
+            assert inner is outer
+        await outer.execute("DELETE FROM stocks")
+
+    assert await db.get_stock_count() == 3
+
+
+@pytest.mark.asyncio
+async def test_read_pool_sees_committed_writes(db):
+    await db.upsert_screener_metrics([
+        {'symbol': 'VNM', 'exchange': 'HOSE', 'market_cap': 10},
+        {'symbol': 'FPT', 'exchange': 'HOSE', 'market_cap': 20},
+    ])
+
+    metrics = await db.get_screener_metrics(exchange='HOSE')
+
+    assert [m['symbol'] for m in metrics] == ['FPT', 'VNM']
+
+    async with db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            await conn.execute("CREATE TEMP TABLE scratch (x)")
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_borrowed_readers(db):
+    borrowed, released = asyncio.Event(), asyncio.Event()
+
+    async def borrow():
+        async with db.reader() as conn:
+            await conn.execute("SELECT 1")
+            borrowed.set()
+            await released.wait()
+
+    borrower = asyncio.create_task(borrow())
+    await borrowed.wait()
+    closing = asyncio.create_task(db.close())
+    await asyncio.sleep(0.05)
+    assert not closing.done()
+
+    released.set()
+    await borrower
+    await closing
+    assert db._readers is None and db._reader_conns == []
+
+
+@pytest.mark.asyncio
+async def test_small_lookups_use_sync_readers(db):
+    await db.upsert_market_indices([
+        {'index_code': 'VNINDEX', 'timestamp': '2024-01-01', 'value': 1100.0},
+        {'index_code': 'VNINDEX', 'timestamp': '2024-01-02', 'value': 1120.0},
+        {'index_code': 'HNX', 'timestamp': '2024-01-01', 'value': 230.0},
+    ])
+
+    latest = await db.get_market_indices('VNINDEX')
+
+    assert [(i['timestamp'], i['value']) for i in latest] == [('2024-01-02', 1120.0)]
+    every = await db.get_market_indices()
+    assert sorted((i['index_code'], i['value']) for i in every) == [('HNX', 230.0), ('VNINDEX', 1120.0)]
+    assert db._sync_reader_conns
+
+    await db.close()
+    assert db._sync_reader_conns == []
+
+
+@pytest.mark.asyncio
+async def test_industry_flow_skips_unchanged_rows(db):
+    rows = [{'industry_name': 'Ngân hàng', 'cashflow': 5.0, 'timestamp': 't1'}]
+    await db.upsert_industry_flow(rows)
+
+    await db.upsert_industry_flow([{**rows[0], 'timestamp': 't2'}])
+    assert (await db.get_industry_flow())[0]['timestamp'] == 't1'
+
+    await db.upsert_industry_flow([{**rows[0], 'cashflow': 6.0, 'timestamp': 't3'}])
+    flow = (await db.get_industry_flow())[0]
+    assert (flow['cashflow'], flow['timestamp']) == (6.0, 't3')
+
+
+@pytest.mark.asyncio
+async def test_industry_flow_reads_latest_day_from_reader(db):
+    await db.upsert_industry_flow([
+        {'industry_name': 'Ngân hàng', 'cashflow': 5.0},
+        {'industry_name': 'Bất động sản', 'cashflow': 9.0},
+    ])
+
+    async with db.connection() as conn:
+        await conn.execute(
+            "INSERT INTO industry_flow (industry_name, cashflow, date_collected) VALUES ('Thép', 99.0, '2000-01-01')"
+        )
+        await conn.commit()
+
+    flow = await db.get_industry_flow(limit=1)
+    assert [(f['industry_name'], f['cashflow']) for f in flow] == [('Bất động sản', 9.0)]
+
+    # Without the cached date the latest day is looked up again
+    db._lookup_cache.clear()
+    flow = await db.get_industry_flow(columns=['industry_name'])
+    assert flow == [{'industry_name': 'Bất động sản'}, {'industry_name': 'Ngân hàng'}]
+
+
+@pytest.mark.asyncio
+async def test_get_database_initializes_one_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_module, '_db', None)
+    path = str(tmp_path / "global.db")
+
+    first, second = await asyncio.gather(get_database(path), get_database(path))
+
+    assert first is second
+    assert await first.get_stock_count() == 0
+    await first.close()